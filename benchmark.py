@@ -0,0 +1,482 @@
+"""Набор бенчмарков извлечения данных и генерации документов.
+
+Примеры:
+    python benchmark.py --events 5 --sessions 4 --contributions 30 --output bench.json
+    python benchmark.py --seed-db --events 200 --output bench.json
+    python benchmark.py --compare old.json bench.json
+
+Синтетические конференции строятся генератором synthetic_conference с
+фиксированным зерном. С флагом --seed-db в базу, заданную переменными
+INDICO_DB_* (см. database.load_db_config), записывается упрощенная схема
+Indico с теми же параметрами, после чего замеряется извлечение.
+"""
+import argparse
+import json
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from datetime import datetime, timedelta
+
+import database
+import doc_generator
+import instrumentation
+from models import Conference
+
+FIRST_NAMES = ['Иван', 'Анна', 'Петр', 'Мария', 'Алексей', 'Елена', 'Дмитрий', 'Ольга']
+MIDDLE_NAMES = ['Иванович', 'Петровна', 'Сергеевич', 'Андреевна', 'Олегович', 'Дмитриевна']
+LAST_NAMES = ['Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Соколов', 'Лебедева', 'Козлов', 'Новикова']
+AFFILIATIONS = ['Студент гр. 4331', 'Студент гр. 4332', 'Магистрант гр. М431', 'Магистрант гр. М432']
+TITLE_WORDS = ['разработка', 'анализ', 'системы', 'методов', 'машинного', 'обучения', 'веб-приложения',
+               'базы', 'данных', 'алгоритмов', 'моделирование', 'распределенной', 'обработки']
+
+# Доли состояний рецензирования в синтетических данных (коды как в REVIEW_STATES)
+REVIEW_STATE_WEIGHTS = {0: 2, 1: 2, 2: 5, 3: 1, 4: 1}
+
+# Маркер синтетической базы: без него --seed-db не трогает существующую схему
+SEED_MARKER_TABLE = "public.benchmark_seed"
+
+SEED_SCHEMA = """
+    DROP SCHEMA IF EXISTS events CASCADE;
+    DROP SCHEMA IF EXISTS users CASCADE;
+    DROP SCHEMA IF EXISTS event_paper_reviewing CASCADE;
+    CREATE SCHEMA events;
+    CREATE SCHEMA users;
+    CREATE SCHEMA event_paper_reviewing;
+    CREATE TABLE IF NOT EXISTS public.benchmark_seed (created_dt timestamp NOT NULL);
+
+    CREATE TABLE events.events (
+        id integer PRIMARY KEY, title text NOT NULL,
+        start_dt timestamp NOT NULL, end_dt timestamp NOT NULL,
+        venue_name text, room_name text, address text, timezone text,
+        is_deleted boolean NOT NULL DEFAULT false
+    );
+    CREATE TABLE users.users (
+        id integer PRIMARY KEY, first_name text, last_name text, affiliation text
+    );
+    CREATE TABLE users.emails (
+        id serial PRIMARY KEY, user_id integer NOT NULL, email text NOT NULL,
+        is_primary boolean NOT NULL DEFAULT false
+    );
+    CREATE TABLE events.roles (id integer PRIMARY KEY, event_id integer NOT NULL, name text NOT NULL);
+    CREATE TABLE events.role_members (role_id integer NOT NULL, user_id integer NOT NULL);
+    CREATE TABLE events.sessions (id integer PRIMARY KEY, event_id integer NOT NULL, title text NOT NULL);
+    CREATE TABLE events.session_blocks (id integer PRIMARY KEY, session_id integer NOT NULL, duration interval);
+    CREATE TABLE events.contributions (
+        id integer PRIMARY KEY, event_id integer NOT NULL, title text NOT NULL, duration interval,
+        session_id integer, session_block_id integer
+    );
+    CREATE TABLE events.timetable_entries (
+        id serial PRIMARY KEY, event_id integer NOT NULL, type integer NOT NULL,
+        start_dt timestamp NOT NULL, session_block_id integer, contribution_id integer
+    );
+    CREATE TABLE events.persons (
+        id integer PRIMARY KEY, event_id integer NOT NULL, first_name text, last_name text, affiliation text
+    );
+    CREATE TABLE events.contribution_person_links (
+        id serial PRIMARY KEY, contribution_id integer NOT NULL, person_id integer NOT NULL,
+        is_speaker boolean NOT NULL, display_order integer NOT NULL DEFAULT 0
+    );
+    CREATE TABLE event_paper_reviewing.revisions (
+        id serial PRIMARY KEY, contribution_id integer NOT NULL, state integer NOT NULL,
+        submitted_dt timestamp NOT NULL
+    );
+"""
+
+def random_title(rnd):
+    return ' '.join(rnd.choice(TITLE_WORDS) for _ in range(rnd.randint(4, 10))).capitalize()
+
+def random_review_state(rnd):
+    return rnd.choices(list(REVIEW_STATE_WEIGHTS), weights=list(REVIEW_STATE_WEIGHTS.values()))[0]
+
+def synthetic_conference(event_id, sessions, contributions, seed=0):
+    """Синтетическая конференция в формате database.iter_conferences."""
+    rnd = random.Random(f"{seed}-{event_id}")
+    start = datetime(2024, 4, 1, 10, 0) + timedelta(days=event_id % 60)
+
+    def person(affiliation):
+        return rnd.choice(LAST_NAMES), f'{rnd.choice(FIRST_NAMES)} {rnd.choice(MIDDLE_NAMES)}', affiliation
+
+    leadership = {}
+    for key, affiliation in (("scientific_leader", "д.т.н., профессор"),
+                             ("deputy_leader", "к.т.н., доцент"),
+                             ("secretary", "ассистент")):
+        last_name, first_name, _ = person(affiliation)
+        leadership[key] = {"name": f"{last_name} {first_name}", "affiliation": affiliation}
+    leadership["secretary"]["email"] = f"secretary{event_id}@guap.ru"
+
+    conference = {
+        "id": event_id,
+        "title": f"Синтетическая конференция {event_id}",
+        "start_date": database.format_date_rus(start),
+        "start_time": start.strftime("%H:%M"),
+        "end_date": database.format_date_rus(start + timedelta(days=2)),
+        "end_time": "18:00",
+        "venue_name": "ГУАП",
+        "room_name": "52-18",
+        "address": "ул. Большая Морская, д. 67",
+        "timezone": "Europe/Moscow",
+        "start_dt": start.isoformat(),
+        "end_dt": (start + timedelta(days=2)).isoformat(),
+        "sessions": [],
+        "leadership": leadership
+    }
+    for session_index in range(sessions):
+        session_start = start + timedelta(hours=2 * session_index)
+        session = {
+            "id": event_id * 1000 + session_index,
+            "number": str(session_index + 1),
+            "title": f"Секция {session_index + 1}",
+            "date": database.format_date_rus(session_start),
+            "start_time": session_start.strftime("%H:%M"),
+            "duration": "2:00:00",
+            "room_name": "52-18 БМ.",
+            "contributions": []
+        }
+        for contribution_index in range(contributions):
+            last_name, first_name, affiliation = person(rnd.choice(AFFILIATIONS))
+            session["contributions"].append({
+                "id": (event_id * 1000 + session_index) * 1000 + contribution_index,
+                "title": random_title(rnd),
+                "start_time": (session_start + timedelta(minutes=10 * contribution_index)).strftime("%H:%M"),
+                "duration": "0:10:00",
+                "speaker": {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "full_name": f"{last_name} {first_name}",
+                    "affiliation": affiliation
+                },
+                "review_state": database.REVIEW_STATES[random_review_state(rnd)]
+            })
+        conference["sessions"].append(session)
+    return conference
+
+def seed_database(conn, events, sessions, contributions, seed=0):
+    """Запись синтетической схемы Indico в базу (только в базу с маркером или пустую)."""
+    from psycopg2.extras import execute_values
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('events.events'), to_regclass(%s)", (SEED_MARKER_TABLE,))
+        has_events, has_marker = cur.fetchone()
+        if has_events and not has_marker:
+            raise RuntimeError("в базе уже есть events.events без маркера синтетических данных; "
+                               "заполнение отменено, чтобы не удалить настоящие данные")
+        cur.execute(SEED_SCHEMA)
+        cur.execute(f"INSERT INTO {SEED_MARKER_TABLE} VALUES (now())")
+
+        rows = {name: [] for name in ("events", "users", "emails", "roles", "role_members", "sessions",
+                                      "session_blocks", "contributions", "timetable_entries", "persons",
+                                      "links", "revisions")}
+        for event_id in range(1, events + 1):
+            conference = synthetic_conference(event_id, sessions, contributions, seed)
+            start = datetime.fromisoformat(conference["start_dt"])
+            rows["events"].append((event_id, conference["title"], start, start + timedelta(days=2),
+                                   conference["venue_name"], conference["room_name"],
+                                   conference["address"], conference["timezone"]))
+            role_names = {"scientific_leader": "Научный руководитель секции",
+                          "deputy_leader": "Зам. научного руководителя", "secretary": "Секретарь"}
+            for role_index, (key, person) in enumerate(conference["leadership"].items()):
+                role_id = event_id * 10 + role_index
+                last_name, first_name = person["name"].split(" ", 1)
+                rows["users"].append((role_id, first_name, last_name, person["affiliation"]))
+                rows["emails"].append((role_id, person.get("email", f"user{role_id}@guap.ru"), True))
+                rows["emails"].append((role_id, f"old{role_id}@guap.ru", False))
+                rows["roles"].append((role_id, event_id, role_names[key]))
+                rows["role_members"].append((role_id, role_id))
+            for session_index, session in enumerate(conference["sessions"]):
+                session_start = start + timedelta(hours=2 * session_index)
+                # Каждое синтетическое заседание - отдельный блок; второй блок
+                # относится к заседанию первого, так что в каждом мероприятии
+                # есть заседание из двух блоков со своими докладами в каждом
+                if session_index == 1:
+                    session_id = conference["sessions"][0]["id"]
+                else:
+                    session_id = session["id"]
+                    rows["sessions"].append((session_id, event_id, session["title"]))
+                rows["session_blocks"].append((session["id"], session_id, timedelta(hours=2)))
+                rows["timetable_entries"].append((event_id, 1, session_start, session["id"], None))
+                for index, contribution in enumerate(session["contributions"]):
+                    speaker = contribution["speaker"]
+                    rows["contributions"].append((contribution["id"], event_id, contribution["title"],
+                                                  timedelta(minutes=10), session_id, session["id"]))
+                    rows["timetable_entries"].append((event_id, 2, session_start + timedelta(minutes=10 * index),
+                                                      None, contribution["id"]))
+                    rows["persons"].append((contribution["id"], event_id, speaker["first_name"],
+                                            speaker["last_name"], speaker["affiliation"]))
+                    rows["links"].append((contribution["id"], contribution["id"], True, 0))
+                    # Второй докладчик и соавтор: в документы они не попадают,
+                    # но раньше размножали строки запроса докладов
+                    rows["persons"].append((-contribution["id"], event_id, "Соавтор", "Второй", speaker["affiliation"]))
+                    rows["links"].append((contribution["id"], -contribution["id"], True, 1))
+                    rows["links"].append((contribution["id"], -contribution["id"], False, 2))
+                    state = next(code for code, name in database.REVIEW_STATES.items()
+                                 if name == contribution["review_state"])
+                    if state:
+                        # Ранняя ревизия; в документы попадает состояние последней
+                        rows["revisions"].append((contribution["id"], 4, start - timedelta(days=7)))
+                        rows["revisions"].append((contribution["id"], state, start))
+
+        inserts = (
+            ("events.events (id, title, start_dt, end_dt, venue_name, room_name, address, timezone)", "events"),
+            ("users.users (id, first_name, last_name, affiliation)", "users"),
+            ("users.emails (user_id, email, is_primary)", "emails"),
+            ("events.roles (id, event_id, name)", "roles"),
+            ("events.role_members (role_id, user_id)", "role_members"),
+            ("events.sessions (id, event_id, title)", "sessions"),
+            ("events.session_blocks (id, session_id, duration)", "session_blocks"),
+            ("events.contributions (id, event_id, title, duration, session_id, session_block_id)", "contributions"),
+            ("events.timetable_entries (event_id, type, start_dt, session_block_id, contribution_id)",
+             "timetable_entries"),
+            ("events.persons (id, event_id, first_name, last_name, affiliation)", "persons"),
+            ("events.contribution_person_links (contribution_id, person_id, is_speaker, display_order)", "links"),
+            ("event_paper_reviewing.revisions (contribution_id, state, submitted_dt)", "revisions"),
+        )
+        for table, key in inserts:
+            execute_values(cur, f"INSERT INTO {table} VALUES %s", rows[key], page_size=5000)
+    conn.commit()
+    database.create_indexes(conn)
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+    conn.commit()
+
+def count_rows(conn, event_ids):
+    """Число строк, возвращаемых запросами извлечения ролей, заседаний и докладов."""
+    counts = {}
+    with conn.cursor() as cur:
+        for name, query in (("roles", database.ROLES_QUERY), ("sessions", database.SESSIONS_QUERY),
+                            ("contributions", database.CONTRIBUTIONS_QUERY)):
+            cur.execute(f"SELECT count(*) FROM ({query.strip().rstrip(';')}) AS q", (event_ids,))
+            counts[name] = cur.fetchone()[0]
+    return counts
+
+def counting_cursor_factory():
+    """Класс курсора psycopg2, считающий выполненные запросы."""
+    import psycopg2.extensions
+
+    class CountingCursor(psycopg2.extensions.cursor):
+        queries = 0
+
+        def execute(self, query, vars=None):
+            CountingCursor.queries += 1
+            return super().execute(query, vars)
+
+    return CountingCursor
+
+def peak_rss_kb():
+    """Пиковый RSS процесса в килобайтах (Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bench_extraction(args):
+    conn = database.connect()
+    try:
+        seed_database(conn, args.events, args.sessions, args.contributions, args.seed)
+        cursor_class = counting_cursor_factory()
+        conn.cursor_factory = cursor_class
+        start = time.perf_counter()
+        count = extracted = 0
+        for conference in database.iter_conferences(conn):
+            count += 1
+            extracted += sum(len(session.contributions) for session in conference.sessions)
+        elapsed = time.perf_counter() - start
+        queries = cursor_class.queries
+        conn.rollback()
+        rows = count_rows(conn, list(range(1, args.events + 1)))
+    finally:
+        conn.close()
+    # Запросы должны возвращать ровно одну строку на участника роли,
+    # блок заседания и доклад, несмотря на лишние адреса, ревизии и
+    # соавторов, а каждый доклад должен попасть ровно в один блок
+    expected = {"roles": 3 * args.events, "sessions": args.events * args.sessions,
+                "contributions": args.events * args.sessions * args.contributions}
+    if rows != expected:
+        raise RuntimeError(f"неверное число строк запросов: {rows}, ожидалось {expected}")
+    if extracted != expected["contributions"]:
+        raise RuntimeError(f"неверное число докладов в заседаниях: {extracted}, "
+                           f"ожидалось {expected['contributions']}")
+    return {"seconds": elapsed, "queries": queries, "conferences": count,
+            "rows": rows, "peak_rss_kb": peak_rss_kb()}
+
+def bench_rendering(conferences, output_dir):
+    """Среднее время генерации каждого типа документа (без кэша файлов)."""
+    results = {}
+    for generator, _, _ in doc_generator.DOCUMENTS:
+        start = time.perf_counter()
+        for conference in conferences:
+            generator(conference, output_dir, fragments=False)
+        results[generator.__name__] = (time.perf_counter() - start) / len(conferences)
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+def bench_template_startup(repeat):
+    """Стоимость создания пустого документа: без кэша и из кэша шаблонов."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        doc_generator.prepare_template(14)
+    uncached = (time.perf_counter() - start) / repeat
+    doc_generator.new_document(14)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        doc_generator.new_document(14)
+    cached = (time.perf_counter() - start) / repeat
+    return {"uncached": uncached, "cached": cached}
+
+def bench_report_table(sizes, output_dir, seed):
+    """Время генерации отчета с одним заседанием из n докладов."""
+    results = {}
+    for size in sizes:
+        conference = Conference.from_dict(synthetic_conference(1, 1, size, seed))
+        start = time.perf_counter()
+        doc_generator.create_report_docx(conference, output_dir, fragments=False)
+        results[str(size)] = time.perf_counter() - start
+    return results
+
+def process_peak_rss_kb():
+    """Пиковый RSS текущего процесса в килобайтах (VmHWM, Linux).
+
+    В отличие от ru_maxrss, VmHWM сбрасывается при exec и не наследует пик
+    родителя, от которого запущен процесс; без /proc - ru_maxrss.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return peak_rss_kb()
+
+def measure_streaming(name, minimum, size, output_dir, seed):
+    """Генерация документа name в отдельном процессе: время, пиковый RSS
+    процесса и его прирост за генерацию (КБ)."""
+    doc_generator.STREAMING_MIN_CONTRIBUTIONS = minimum
+    conference = Conference.from_dict(synthetic_conference(1, 4, size // 4, seed))
+    generator = getattr(doc_generator, name)
+    # Шаблон загружается заранее, чтобы прирост относился только к документу
+    doc_generator.new_document(14)
+    doc_generator.new_document(10)
+    before = process_peak_rss_kb()
+    start = time.perf_counter()
+    generator(conference, output_dir, fragments=False)
+    elapsed = time.perf_counter() - start
+    peak = process_peak_rss_kb()
+    return {"seconds": elapsed, "peak_rss_kb": peak, "rss_growth_kb": peak - before}
+
+def bench_streaming(size, output_dir, seed):
+    """Время и пиковый RSS программы и отчета на size докладов: с деревом
+    документа в памяти и с потоковой записью.
+
+    Память дерева lxml и буферов libxml2 выделяется вне Python и не видна
+    tracemalloc, поэтому замеряется пиковый RSS. Он не сбрасывается внутри
+    процесса, так что каждый документ каждого режима строится в новом
+    процессе (spawn, без унаследованной памяти).
+    """
+    results = {}
+    for backend, minimum in (("tree", float("inf")), ("streaming", 0)):
+        for name in ("create_program_docx", "create_report_docx"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                results[f"{backend}.{name}"] = executor.submit(
+                    measure_streaming, name, minimum, size, output_dir, seed).result()
+    return results
+
+def bench_fragments(size, output_dir, seed):
+    """Программа и отчет на size докладов с кэшем фрагментов заседаний:
+    первая генерация, повторная без изменений и после изменения одного доклада."""
+    conference = Conference.from_dict(synthetic_conference(1, 4, size // 4, seed))
+    results = {}
+    for name in ("cold", "unchanged", "one_change"):
+        if name == "one_change":
+            conference.sessions[0].contributions[0].title += " (изменено)"
+        start = time.perf_counter()
+        doc_generator.create_program_docx(conference, output_dir, fragments=True)
+        doc_generator.create_report_docx(conference, output_dir, fragments=True)
+        results[name] = time.perf_counter() - start
+    return results
+
+def flatten(results, prefix=""):
+    """Плоский словарь числовых метрик: {'rendering.create_program_docx': 0.1, ...}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old_path, new_path):
+    """Сравнение двух файлов результатов: значение до, после и отношение."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old_path} ({old.get('revision')}) -> {new_path} ({new.get('revision')})")
+    old_flat = flatten(old["results"])
+    new_flat = flatten(new["results"])
+    for name in sorted(set(old_flat) | set(new_flat)):
+        before, after = old_flat.get(name), new_flat.get(name)
+        ratio = f"x{after / before:.2f}" if before and after is not None else ""
+        print(f"{name:45} {before!s:>22} {after!s:>22} {ratio}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарки извлечения данных и генерации документов.")
+    parser.add_argument("--events", type=int, default=3, help="число мероприятий")
+    parser.add_argument("--sessions", type=int, default=4, help="заседаний в мероприятии")
+    parser.add_argument("--contributions", type=int, default=25, help="докладов в заседании")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора синтетических данных")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов для коротких замеров")
+    parser.add_argument("--table-rows", type=int, nargs="*", default=[100, 1000, 4000],
+                        help="размеры таблицы отчета для замера масштабирования")
+    parser.add_argument("--streaming-size", type=int, default=2000,
+                        help="число докладов для сравнения обычной и потоковой записи документов "
+                             "и для замера кэша фрагментов")
+    parser.add_argument("--seed-db", action="store_true",
+                        help="заполнить базу INDICO_DB_* синтетической схемой и замерить извлечение")
+    parser.add_argument("--output", default="bench_output.json", help="файл для сохранения результатов")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла результатов")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    params = {key: getattr(args, key) for key in ("events", "sessions", "contributions", "seed", "repeat",
+                                                  "table_rows", "streaming_size", "seed_db")}
+    results = {}
+    if args.seed_db:
+        print("Извлечение из синтетической базы...")
+        results["extraction"] = bench_extraction(args)
+
+    conferences = [Conference.from_dict(synthetic_conference(event_id, args.sessions, args.contributions, args.seed))
+                   for event_id in range(1, args.events + 1)]
+    # Остальные замеры генерации повторяют документы в одной папке и без
+    # кэша фрагментов заседаний; он замеряется отдельно (bench_fragments)
+    with tempfile.TemporaryDirectory() as output_dir:
+        print("Генерация документов...")
+        results["rendering"] = bench_rendering(conferences, output_dir)
+        print("Создание документов из шаблона...")
+        results["template_startup"] = bench_template_startup(args.repeat)
+        print("Масштабирование таблицы отчета...")
+        results["report_table"] = bench_report_table(args.table_rows, output_dir, args.seed)
+        print("Потоковая запись документов...")
+        results["streaming"] = bench_streaming(args.streaming_size, output_dir, args.seed)
+    with tempfile.TemporaryDirectory() as output_dir:
+        print("Кэш фрагментов заседаний...")
+        results["fragments"] = bench_fragments(args.streaming_size, output_dir, args.seed)
+    results["peak_rss_kb"] = peak_rss_kb()
+
+    report = {"revision": instrumentation.git_revision(),
+              "created": datetime.now().isoformat(timespec="seconds"),
+              "params": params, "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+    for name, value in flatten(results).items():
+        print(f"{name:45} {value}")
+    print(f"Результаты сохранены в {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,266 @@
 import psycopg2
+import psycopg2.pool
 from datetime import datetime
 import json
-from collections import defaultdict
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+
+import instrumentation
+from models import Conference, Contribution, Person, Session, intern
+
+# Параметры подключения по умолчанию. Переопределяются JSON файлом
+# (путь в INDICO_DB_CONFIG, по умолчанию db_config.json рядом с запуском)
+# и переменными окружения INDICO_DB_NAME, INDICO_DB_USER, INDICO_DB_PASSWORD,
+# INDICO_DB_HOST, INDICO_DB_PORT.
+DEFAULT_DB_CONFIG = {
+    "dbname": "indico",
+    "user": "user",
+    "password": "user",
+    "host": "localhost",
+    "port": "5432"
+}
+
+DB_CONFIG_ENV = {
+    "dbname": "INDICO_DB_NAME",
+    "user": "INDICO_DB_USER",
+    "password": "INDICO_DB_PASSWORD",
+    "host": "INDICO_DB_HOST",
+    "port": "INDICO_DB_PORT"
+}
+
+# Число мероприятий в одной задаче параллельного извлечения
+PARALLEL_CHUNK_SIZE = 20
+
+# Размер порции строк, получаемой с сервера за раз серверным курсором
+ITERSIZE = 2000
+
+# Словарь для маппинга состояний рецензирования
+REVIEW_STATES = {
+    0: "not submitted",
+    1: "submitted",
+    2: "accepted",
+    3: "rejected",
+    4: "to be corrected"
+}
+
+EVENTS_QUERY = """
+    SELECT
+        id,
+        title,
+        start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
+        end_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS end_dt_moscow,
+        venue_name,
+        room_name,
+        address,
+        timezone
+    FROM events.events
+    WHERE is_deleted = false AND id = ANY(%s)
+    ORDER BY id;
+"""
+
+EVENT_IDS_QUERY = """
+    SELECT id
+    FROM events.events
+    WHERE is_deleted = false
+    ORDER BY id;
+"""
+
+CATALOG_QUERY = """
+    SELECT
+        id,
+        title,
+        start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
+        end_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS end_dt_moscow
+    FROM events.events
+    WHERE is_deleted = false
+    ORDER BY id;
+"""
+
+# Одна строка на участника роли: берется только основной адрес почты
+ROLES_QUERY = """
+    SELECT
+        r.event_id,
+        r.name AS role_name,
+        u.first_name,
+        u.last_name,
+        u.affiliation,
+        ue.email
+    FROM events.roles r
+    JOIN events.role_members rm ON rm.role_id = r.id
+    JOIN users.users u ON rm.user_id = u.id
+    LEFT JOIN users.emails ue ON ue.user_id = u.id AND ue.is_primary = true
+    WHERE r.event_id = ANY(%s)
+    ORDER BY r.event_id, r.id, u.id;
+"""
+
+SESSIONS_QUERY = """
+    SELECT
+        s.event_id,
+        sb.id,
+        s.title AS session_title,
+        t.start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
+        sb.duration,
+        e.room_name
+    FROM events.session_blocks sb
+    JOIN events.sessions s ON sb.session_id = s.id
+    JOIN events.timetable_entries t ON t.session_block_id = sb.id
+    JOIN events.events e ON s.event_id = e.id
+    WHERE s.event_id = ANY(%s) AND t.event_id = s.event_id AND t.type = 1
+    ORDER BY s.event_id, t.start_dt;
+"""
+
+# Одна строка на доклад: первый по порядку докладчик и состояние последней
+# ревизии выбираются на стороне сервера. Доклады привязываются к блоку
+# заседания (строке SESSIONS_QUERY) по id блока: у заседания из нескольких
+# блоков каждый доклад попадает только в свой блок.
+CONTRIBUTIONS_QUERY = """
+    SELECT
+        t.event_id,
+        c.session_block_id,
+        c.id,
+        c.title AS contribution_title,
+        t.start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
+        c.duration,
+        p.first_name,
+        p.last_name,
+        p.affiliation,
+        COALESCE(r.state, 0) AS review_state
+    FROM events.timetable_entries t
+    JOIN events.contributions c ON t.contribution_id = c.id
+    JOIN LATERAL (
+        SELECT sp.first_name, sp.last_name, sp.affiliation
+        FROM events.contribution_person_links cp
+        JOIN events.persons sp ON cp.person_id = sp.id
+        WHERE cp.contribution_id = c.id AND cp.is_speaker = true
+        ORDER BY cp.display_order, cp.id
+        LIMIT 1
+    ) p ON true
+    LEFT JOIN LATERAL (
+        SELECT rv.state
+        FROM event_paper_reviewing.revisions rv
+        WHERE rv.contribution_id = c.id
+        ORDER BY rv.id DESC
+        LIMIT 1
+    ) r ON true
+    WHERE t.event_id = ANY(%s) AND t.type = 2 AND c.session_block_id IS NOT NULL
+    ORDER BY t.event_id, t.start_dt;
+"""
+
+# Индексы, покрывающие запросы извлечения: выбор докладчика, последней
+# ревизии и основного адреса почты читает только индекс. Создаются
+# командой main.py --create-indexes (CONCURRENTLY, без блокировки записи).
+INDEXES = (
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docgen_timetable_entries_event_type
+        ON events.timetable_entries (event_id, type, start_dt)
+        INCLUDE (contribution_id, session_block_id)""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docgen_contribution_person_links_speaker
+        ON events.contribution_person_links (contribution_id, display_order, id)
+        INCLUDE (person_id) WHERE is_speaker""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docgen_revisions_contribution_latest
+        ON event_paper_reviewing.revisions (contribution_id, id DESC)
+        INCLUDE (state)""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docgen_emails_primary
+        ON users.emails (user_id)
+        INCLUDE (email) WHERE is_primary""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docgen_roles_event
+        ON events.roles (event_id, id)
+        INCLUDE (name)""",
+)
+
+# Канал уведомлений об изменениях данных, которые читают запросы выше
+NOTIFY_CHANNEL = "docgen_changes"
+
+# Таблицы, на которые main.py --install-triggers ставит триггер уведомлений,
+# и запрос, находящий по измененной строке ($1) затронутые мероприятия
+NOTIFY_TABLES = {
+    "events.events": "SELECT ($1).id",
+    "events.roles": "SELECT ($1).event_id",
+    "events.role_members": "SELECT event_id FROM events.roles WHERE id = ($1).role_id",
+    "users.users": """SELECT r.event_id FROM events.roles r
+                      JOIN events.role_members rm ON rm.role_id = r.id WHERE rm.user_id = ($1).id""",
+    "users.emails": """SELECT r.event_id FROM events.roles r
+                       JOIN events.role_members rm ON rm.role_id = r.id WHERE rm.user_id = ($1).user_id""",
+    "events.sessions": "SELECT ($1).event_id",
+    "events.session_blocks": "SELECT event_id FROM events.sessions WHERE id = ($1).session_id",
+    "events.timetable_entries": "SELECT ($1).event_id",
+    "events.contributions": "SELECT ($1).event_id",
+    "events.contribution_person_links": "SELECT event_id FROM events.contributions WHERE id = ($1).contribution_id",
+    "events.persons": "SELECT ($1).event_id",
+    "event_paper_reviewing.revisions": "SELECT event_id FROM events.contributions WHERE id = ($1).contribution_id",
+}
+
+# Функция триггера: для старой и новой версии строки находит мероприятия
+# запросом из аргумента триггера и отправляет {"event_id": ..., "table": ...}.
+# Одинаковые уведомления в одной транзакции PostgreSQL объединяет сам.
+NOTIFY_FUNCTION = """
+    CREATE OR REPLACE FUNCTION public.docgen_notify() RETURNS trigger AS $$
+    DECLARE
+        changed_event_id integer;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            FOR changed_event_id IN EXECUTE TG_ARGV[0] USING OLD LOOP
+                PERFORM pg_notify('""" + NOTIFY_CHANNEL + """', json_build_object(
+                    'event_id', changed_event_id, 'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME)::text);
+            END LOOP;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            FOR changed_event_id IN EXECUTE TG_ARGV[0] USING NEW LOOP
+                PERFORM pg_notify('""" + NOTIFY_CHANNEL + """', json_build_object(
+                    'event_id', changed_event_id, 'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME)::text);
+            END LOOP;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+"""
+
+NOTIFY_TRIGGER_NAME = "docgen_notify"
+
+# Отпечаток мероприятия: md5 от всех строк, которые читают запросы выше.
+# Считается на стороне сервера, поэтому по сети передается одна короткая
+# строка на мероприятие.
+FINGERPRINTS_QUERY = """
+    SELECT
+        e.id,
+        md5(concat_ws('|',
+            e.title, e.start_dt, e.end_dt, e.venue_name, e.room_name, e.address, e.timezone,
+            (SELECT string_agg(concat_ws(',', r.id, r.name, u.id, u.first_name, u.last_name,
+                                         u.affiliation, ue.email), ';'
+                               ORDER BY r.id, u.id)
+             FROM events.roles r
+             JOIN events.role_members rm ON rm.role_id = r.id
+             JOIN users.users u ON rm.user_id = u.id
+             LEFT JOIN users.emails ue ON ue.user_id = u.id AND ue.is_primary = true
+             WHERE r.event_id = e.id),
+            (SELECT string_agg(concat_ws(',', sb.id, s.title, t.start_dt, sb.duration), ';'
+                               ORDER BY sb.id)
+             FROM events.session_blocks sb
+             JOIN events.sessions s ON sb.session_id = s.id
+             JOIN events.timetable_entries t ON t.session_block_id = sb.id
+             WHERE s.event_id = e.id AND t.event_id = e.id AND t.type = 1),
+            (SELECT string_agg(concat_ws(',', c.id, c.title, c.session_id, c.session_block_id, t.start_dt, c.duration,
+                                         cp.is_speaker, cp.display_order, p.id, p.first_name, p.last_name,
+                                         p.affiliation, r.id, r.state), ';'
+                               ORDER BY c.id, p.id, r.id)
+             FROM events.timetable_entries t
+             JOIN events.contributions c ON t.contribution_id = c.id
+             JOIN events.contribution_person_links cp ON cp.contribution_id = c.id
+             JOIN events.persons p ON cp.person_id = p.id
+             LEFT JOIN event_paper_reviewing.revisions r ON r.contribution_id = c.id
+             WHERE t.event_id = e.id AND t.type = 2)
+        )) AS fingerprint
+    FROM events.events e
+    WHERE e.is_deleted = false
+    {event_filter}
+    ORDER BY e.id;
+"""
 
 def format_date_rus(dt):
     """Форматирование даты на русский."""
@@ -14,181 +273,510 @@ def format_date_rus(dt):
     month = months[dt.strftime("%B")]
     return f"{day} {month}"
 
-def create_conference_json(json_file_path):
-    """Создание JSON файла с данными всех конференций из базы данных."""
-    # Подключение к базе данных Indico
-    conn = psycopg2.connect(
-        dbname="indico",
-        user="user",
-        password="user",
-        host="localhost",
-        port="5432"
+def load_db_config():
+    """Параметры подключения: значения по умолчанию, файл конфигурации, окружение."""
+    config = dict(DEFAULT_DB_CONFIG)
+    config_path = os.environ.get("INDICO_DB_CONFIG", "db_config.json")
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    for key, env_name in DB_CONFIG_ENV.items():
+        value = os.environ.get(env_name)
+        if value:
+            config[key] = value
+    return config
+
+def connect():
+    """Подключение к базе данных Indico."""
+    return psycopg2.connect(**load_db_config())
+
+def create_pool(maxconn, minconn=1):
+    """Пул соединений для использования из нескольких потоков."""
+    return psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **load_db_config())
+
+@contextmanager
+def pooled_connection(pool):
+    """Соединение из пула; транзакция откатывается перед возвратом в пул."""
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+def create_indexes(conn):
+    """Создание индексов INDEXES (уже существующие пропускаются).
+
+    CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции, поэтому
+    на время создания соединение переводится в режим autocommit.
+    """
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for statement in INDEXES:
+                with instrumentation.span("query", "create_index"):
+                    cur.execute(statement)
+    finally:
+        conn.autocommit = autocommit
+
+def install_triggers(conn):
+    """Установка функции и триггеров уведомлений NOTIFY_TABLES (повторно - заменяются)."""
+    with conn.cursor() as cur:
+        cur.execute(NOTIFY_FUNCTION)
+        for table, query in NOTIFY_TABLES.items():
+            cur.execute(f"DROP TRIGGER IF EXISTS {NOTIFY_TRIGGER_NAME} ON {table}")
+            cur.execute(
+                f"CREATE TRIGGER {NOTIFY_TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION public.docgen_notify(%s)",
+                (" ".join(query.split()),)
+            )
+    conn.commit()
+
+def remove_triggers(conn):
+    """Удаление триггеров и функции уведомлений."""
+    with conn.cursor() as cur:
+        for table in NOTIFY_TABLES:
+            cur.execute(f"DROP TRIGGER IF EXISTS {NOTIFY_TRIGGER_NAME} ON {table}")
+        cur.execute("DROP FUNCTION IF EXISTS public.docgen_notify()")
+    conn.commit()
+
+def triggers_installed(conn):
+    """Установлены ли триггеры уведомлений на все таблицы NOTIFY_TABLES."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM pg_trigger WHERE tgname = %s AND NOT tgisinternal",
+            (NOTIFY_TRIGGER_NAME,)
+        )
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count == len(NOTIFY_TABLES)
+
+def build_leadership(roles):
+    """Сборка оргкомитета (leadership) из строк ролей одного мероприятия."""
+    leadership = {}
+    for role_name, first_name, last_name, affiliation, email in roles:
+        person = Person.create(first_name, last_name, affiliation, email)
+
+        if "Научный руководитель" in role_name:
+            leadership["scientific_leader"] = person
+        elif "Зам" in role_name:
+            leadership["deputy_leader"] = person
+        elif "Секретарь" in role_name:
+            leadership["secretary"] = person
+        else:
+            leadership[intern(role_name)] = person
+    return leadership
+
+def build_contribution(row):
+    """Сборка доклада из строки запроса докладов."""
+    contrib_id, title, start_dt, duration, first_name, last_name, affiliation, review_state = row
+    return Contribution(
+        contrib_id,
+        title,
+        intern(start_dt.strftime("%H:%M")),
+        intern(str(duration)),
+        Person.create(first_name, last_name, affiliation),
+        REVIEW_STATES.get(review_state, "unknown")
     )
-    cur = conn.cursor()
 
-    # Словарь для маппинга состояний рецензирования
-    review_states = {
-        0: "not submitted",
-        1: "submitted",
-        2: "accepted",
-        3: "rejected",
-        4: "to be corrected"
-    }
+def stream_rows(conn, name, query, params=None, itersize=None):
+    """Генератор строк из именованного (серверного) курсора.
 
-    # Структура для хранения данных
-    conference_data = {
-        "conferences": []
-    }
+    Строки передаются с сервера порциями по itersize, а не загружаются
+    в память клиента целиком, как при fetchall().
+    """
+    with conn.cursor(name=name) as cur:
+        cur.itersize = itersize or ITERSIZE
+        if not instrumentation.ENABLED:
+            cur.execute(query, params)
+            yield from cur
+            return
 
-    # Извлечение всех конференций
-    cur.execute("""
-        SELECT
-            id,
-            title,
-            start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
-            end_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS end_dt_moscow,
-            venue_name,
-            room_name,
-            address,
-            timezone
-        FROM events.events
-        WHERE is_deleted = false
-        ORDER BY id;
-    """)
-    events = cur.fetchall()
+        # В трассировку попадает время выполнения и чтения строк без
+        # времени обработки строк потребителем
+        start = time.perf_counter()
+        cur.execute(query, params)
+        duration = time.perf_counter() - start
+        rows = 0
+        rows_iter = iter(cur)
+        while True:
+            fetch_start = time.perf_counter()
+            row = next(rows_iter, None)
+            duration += time.perf_counter() - fetch_start
+            if row is None:
+                break
+            rows += 1
+            yield row
+        instrumentation.record("query", name, start, duration, rows=rows)
+
+def query_all(cur, label, query, params=None):
+    """Выполнение запроса и получение всех строк с записью в трассировку."""
+    with instrumentation.span("query", label) as span:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        if span:
+            span.attrs["rows"] = len(rows)
+    return rows
+
+def rows_by_event(rows):
+    """Разбор упорядоченного по event_id потока строк по мероприятиям.
+
+    Возвращает функцию take(event_id), которая отдает итератор по строкам
+    (без event_id) очередного мероприятия. Мероприятия запрашиваются по
+    возрастанию id, поэтому поток читается один раз, а строки не
+    собираются в список: итератор читает их прямо из курсора. Итератор
+    нужно дочитать до следующего вызова take - тот переходит к следующей
+    группе строк.
+    """
+    groups = groupby(rows, key=itemgetter(0))
+    current = None
+
+    def take(event_id):
+        nonlocal current
+        while True:
+            if current is None:
+                current = next(groups, None)
+                if current is None:
+                    return iter(())
+            key, group = current
+            if key > event_id:
+                return iter(())
+            current = None
+            if key == event_id:
+                return (row[1:] for row in group)
+
+    return take
+
+def iter_conferences(conn, event_ids=None, itersize=None):
+    """Генератор конференций с оргкомитетом, заседаниями и докладами.
+
+    Мероприятия, роли, заседания и доклады читаются четырьмя запросами на
+    все мероприятия сразу через серверные курсоры, упорядоченными по
+    event_id. Потоки сливаются по event_id, и каждая конференция отдается,
+    как только собрана. Строки читаются порциями по itersize и сразу
+    превращаются в объекты модели, поэтому память ограничена объектами
+    одной (текущей) конференции и порциями строк курсоров; она не зависит
+    от числа мероприятий, но растет с размером самого большого из них.
+    """
+    if event_ids is None:
+        with conn.cursor() as cur:
+            event_ids = [row[0] for row in query_all(cur, "event_ids", EVENT_IDS_QUERY)]
+    ids = sorted(event_ids)
+    if not ids:
+        return
+
+    events = stream_rows(conn, "events", EVENTS_QUERY, (ids,), itersize)
+    roles = rows_by_event(stream_rows(conn, "roles", ROLES_QUERY, (ids,), itersize))
+    sessions = rows_by_event(stream_rows(conn, "sessions", SESSIONS_QUERY, (ids,), itersize))
+    contributions = rows_by_event(stream_rows(conn, "contributions", CONTRIBUTIONS_QUERY, (ids,), itersize))
 
     for event in events:
         event_id, title, start_dt, end_dt, venue_name, room_name, address, timezone = event
-        conference = {
+        conference = Conference(
+            event_id,
+            title,
+            intern(format_date_rus(start_dt)),
+            intern(start_dt.strftime("%H:%M")),
+            intern(format_date_rus(end_dt)),
+            intern(end_dt.strftime("%H:%M")),
+            intern(venue_name),
+            intern(room_name),
+            intern(address),
+            intern(timezone),
+            start_dt.isoformat(),
+            end_dt.isoformat()
+        )
+
+        # --- Извлечение оргкомитета (leadership) ---
+        conference.leadership = build_leadership(roles(event_id))
+
+        # Доклады мероприятия, сгруппированные по id блока заседания;
+        # списки передаются в заседания без копирования
+        contributions_by_block = defaultdict(list)
+        for block_id, *contrib in contributions(event_id):
+            contributions_by_block[block_id].append(build_contribution(contrib))
+
+        for session_index, session in enumerate(sessions(event_id), 1):
+            block_id, session_title, start_dt, duration, room_name = session
+            conference.sessions.append(Session(
+                block_id,
+                str(session_index),
+                intern(session_title),
+                intern(format_date_rus(start_dt)),
+                intern(start_dt.strftime("%H:%M")),
+                intern(str(duration)),
+                intern(f"{room_name} БМ." if room_name else ""),
+                contributions_by_block.pop(block_id, [])
+            ))
+
+        yield conference
+
+def fetch_conferences(conn, event_ids=None):
+    """Извлечение списка конференций (см. iter_conferences)."""
+    return list(iter_conferences(conn, event_ids))
+
+def iter_conferences_parallel(event_ids, workers, pool=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """Параллельное извлечение конференций в workers потоках.
+
+    Мероприятия делятся на пачки по chunk_size, каждая пачка извлекается
+    в отдельном потоке на соединении из пула. Результаты отдаются строго
+    в порядке id; одновременно в работе не больше 2 * workers пачек.
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = create_pool(workers)
+    ids = sorted(event_ids)
+
+    def extract(chunk):
+        with pooled_connection(pool) as conn:
+            return fetch_conferences(conn, chunk)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for start in range(0, len(ids), chunk_size):
+                pending.append(executor.submit(extract, ids[start:start + chunk_size]))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        if own_pool:
+            pool.closeall()
+
+def extract_conferences(conn, event_ids, workers=1):
+    """Генератор конференций: на соединении conn или параллельно при workers > 1."""
+    if workers > 1:
+        return iter_conferences_parallel(event_ids, workers)
+    return iter_conferences(conn, event_ids)
+
+def prefetch(items, size):
+    """Генератор, забегающий вперед: items перебирается в отдельном потоке.
+
+    Готовые элементы складываются в очередь длиной не больше size, поэтому
+    извлечение следующих конференций идет одновременно с обработкой
+    предыдущих, а при медленном потребителе поток ждет места в очереди.
+    Исключение потока извлечения передается потребителю. При закрытии
+    генератора поток останавливается, а items закрывается.
+    """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def fetch_fingerprints(cur, event_ids=None):
+    """Отпечатки данных мероприятий: {str(event_id): md5}."""
+    if event_ids is None:
+        rows = query_all(cur, "fingerprints", FINGERPRINTS_QUERY.format(event_filter=""))
+    else:
+        rows = query_all(cur, "fingerprints", FINGERPRINTS_QUERY.format(event_filter="AND e.id = ANY(%s)"),
+                         (list(event_ids),))
+    return {str(event_id): fingerprint for event_id, fingerprint in rows}
+
+def fetch_catalog(conn=None):
+    """Список конференций (id, название, даты) без заседаний и докладов.
+
+    Если conn не передано, открывается и закрывается отдельное соединение.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    cur = conn.cursor()
+    catalog = [
+        {
             "id": event_id,
             "title": title,
             "start_date": format_date_rus(start_dt),
-            "start_time": start_dt.strftime("%H:%M"),
             "end_date": format_date_rus(end_dt),
-            "end_time": end_dt.strftime("%H:%M"),
-            "venue_name": venue_name or "",
-            "room_name": room_name or "",
-            "address": address or "",
-            "timezone": timezone,
-            "sessions": []
+            "start_dt": start_dt.isoformat(),
+            "end_dt": end_dt.isoformat()
         }
+        for event_id, title, start_dt, end_dt in query_all(cur, "catalog", CATALOG_QUERY)
+    ]
+    cur.close()
+    if own_conn:
+        conn.close()
+    return catalog
 
-        # --- Извлечение оргкомитета (leadership) ---
-        cur.execute("""
-            SELECT
-                r.name AS role_name,
-                u.first_name,
-                u.last_name,
-                u.affiliation,
-                ue.email
-            FROM events.roles r
-            JOIN events.role_members rm ON rm.role_id = r.id
-            JOIN users.users u ON rm.user_id = u.id
-            LEFT JOIN users.emails ue ON ue.user_id = u.id
-            WHERE r.event_id = %s
-            ORDER BY r.id;
-        """, (event_id,))
-        roles = cur.fetchall()
-
-        leadership = {}
-        for role_name, first_name, last_name, affiliation, email in roles:
-            person_data = {
-                "name": f"{last_name} {first_name}",
-                "affiliation": affiliation or ""
-            }
-            if email:
-                person_data["email"] = email
-
-            if "Научный руководитель" in role_name:
-                leadership["scientific_leader"] = person_data
-            elif "Зам" in role_name:
-                leadership["deputy_leader"] = person_data
-            elif "Секретарь" in role_name:
-                leadership["secretary"] = person_data
-            else:
-                leadership[role_name] = person_data
-
-        conference["leadership"] = leadership
-
-        # Извлечение данных о сессиях и докладах
-        cur.execute("""
-            SELECT
-                sb.id,
-                s.title AS session_title,
-                t.start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
-                sb.duration,
-                e.room_name
-            FROM events.session_blocks sb
-            JOIN events.sessions s ON sb.session_id = s.id
-            JOIN events.timetable_entries t ON t.session_block_id = sb.id
-            JOIN events.events e ON s.event_id = e.id
-            WHERE s.event_id = %s AND t.event_id = %s AND t.type = 1
-            ORDER BY t.start_dt;
-        """, (event_id, event_id))
-        sessions = cur.fetchall()
-
-        for session_index, session in enumerate(sessions, 1):
-            session_id, session_title, start_dt, duration, room_name = session
-            session_number = str(session_index)
-            
-            session_data = {
-                "id": session_id,
-                "number": session_number,
-                "title": session_title,
-                "date": format_date_rus(start_dt),
-                "start_time": start_dt.strftime("%H:%M"),
-                "duration": str(duration),
-                "room_name": f"{room_name} БМ." if room_name else "",
-                "contributions": []
-            }
-            
-            cur.execute("""
-                SELECT
-                    c.id,
-                    c.title AS contribution_title,
-                    t.start_dt AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/Moscow' AS start_dt_moscow,
-                    c.duration,
-                    p.first_name,
-                    p.last_name,
-                    p.affiliation,
-                    COALESCE(r.state, 0) AS review_state
-                FROM events.timetable_entries t
-                JOIN events.contributions c ON t.contribution_id = c.id
-                LEFT JOIN events.sessions s ON c.session_id = s.id
-                JOIN events.contribution_person_links cp ON cp.contribution_id = c.id
-                JOIN events.persons p ON cp.person_id = p.id
-                LEFT JOIN event_paper_reviewing.revisions r ON r.contribution_id = c.id
-                WHERE t.event_id = %s AND t.type = 2 AND cp.is_speaker = true
-                AND s.title = %s
-                ORDER BY t.start_dt;
-            """, (event_id, session_title))
-            contributions = cur.fetchall()
-            
-            for contrib in contributions:
-                contrib_id, title, start_dt, duration, first_name, last_name, affiliation, review_state = contrib
-                session_data["contributions"].append({
-                    "id": contrib_id,
-                    "title": title,
-                    "start_time": start_dt.strftime("%H:%M"),
-                    "duration": str(duration),
-                    "speaker": {
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "full_name": f"{last_name} {first_name}",
-                        "affiliation": affiliation or ""
-                    },
-                    "review_state": review_states.get(review_state, "unknown")
-                })
-            
-            conference["sessions"].append(session_data)
-
-        conference_data["conferences"].append(conference)
+def fetch_conference(event_id, conn=None):
+    """Полное извлечение одной конференции по id. Возвращает None, если ее нет."""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    conferences = fetch_conferences(conn, [event_id])
+    if own_conn:
+        conn.close()
+    return conferences[0] if conferences else None
+
+def snapshot_index_path(json_file_path):
+    """Путь к индексу смещений снимка."""
+    return f"{json_file_path}.idx"
+
+def write_snapshot(json_file_path, conferences, fingerprints):
+    """Потоковая запись снимка конференций.
+
+    Каждая конференция пишется отдельной строкой JSON сразу по мере
+    получения, а в индекс (файл .idx) попадают id, название, даты,
+    смещение, длина строки и отпечаток. В памяти одновременно находится
+    только одна конференция. Файлы заменяются атомарно.
+    """
+    index = []
+    started = time.perf_counter()
+    io_time = 0.0
+    tmp_path = f"{json_file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for conf in conferences:
+            write_start = time.perf_counter()
+            line = (json.dumps(conf.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+            index.append({
+                "id": conf.id,
+                "title": conf.title,
+                "start_date": conf.start_date,
+                "end_date": conf.end_date,
+                "start_dt": conf.start_dt,
+                "end_dt": conf.end_dt,
+                "offset": f.tell(),
+                "length": len(line),
+                "fingerprint": fingerprints.get(str(conf.id))
+            })
+            f.write(line)
+            io_time += time.perf_counter() - write_start
+
+    index_path = snapshot_index_path(json_file_path)
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"conferences": index}, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, json_file_path)
+    os.replace(f"{index_path}.tmp", index_path)
+    instrumentation.record("io", "write_snapshot", started, io_time, conferences=len(index))
+
+@instrumentation.traced("io")
+def read_snapshot_index(json_file_path):
+    """Чтение индекса снимка: список конференций без заседаний и докладов."""
+    with open(snapshot_index_path(json_file_path), "r", encoding="utf-8") as f:
+        return json.load(f)["conferences"]
+
+def read_snapshot_conference(f, entry):
+    """Чтение одной конференции из открытого (в режиме 'rb') файла снимка."""
+    f.seek(entry["offset"])
+    return Conference.from_dict(json.loads(f.read(entry["length"]).decode("utf-8")))
+
+@instrumentation.traced("io")
+def load_snapshot_conference(json_file_path, event_id):
+    """Загрузка одной конференции из снимка без разбора остальных."""
+    for entry in read_snapshot_index(json_file_path):
+        if entry["id"] == event_id:
+            with open(json_file_path, "rb") as f:
+                return read_snapshot_conference(f, entry)
+    return None
+
+def iter_snapshot_conferences(json_file_path, event_ids=None):
+    """Генератор конференций из снимка (всех или только с указанными id)."""
+    wanted = set(event_ids) if event_ids is not None else None
+    index = read_snapshot_index(json_file_path)
+    with open(json_file_path, "rb") as f:
+        for entry in index:
+            if wanted is None or entry["id"] in wanted:
+                yield read_snapshot_conference(f, entry)
+
+def create_conference_json(json_file_path, event_ids=None, workers=1):
+    """Создание снимка с данными всех конференций из базы данных."""
+    conn = connect()
+    cur = conn.cursor()
+
+    # Отпечатки берутся до данных: изменение между запросами будет
+    # замечено при следующем обновлении, а не потеряно.
+    fingerprints = fetch_fingerprints(cur, event_ids)
+    ids = [int(event_id) for event_id in fingerprints]
+    write_snapshot(json_file_path, extract_conferences(conn, ids, workers), fingerprints)
 
     # Закрытие соединения
     cur.close()
     conn.close()
 
-    # Сохранение данных в JSON
-    with open(json_file_path, "w", encoding="utf-8") as f:
-        json.dump(conference_data, f, ensure_ascii=False, indent=4)
+def update_conference_json(json_file_path, workers=1):
+    """Инкрементальное обновление снимка конференций.
+
+    Сравнивает отпечатки мероприятий с сохраненными в индексе снимка и
+    повторно извлекает только изменившиеся и новые мероприятия; остальные
+    переносятся из старого снимка построчно, удаленные убираются.
+    Если снимка нет, он строится заново.
+    Возвращает пару (список обновленных id, список удаленных id).
+    """
+    try:
+        old_index = {entry["id"]: entry for entry in read_snapshot_index(json_file_path)}
+        old_file = open(json_file_path, "rb")
+    except (OSError, ValueError, KeyError):
+        old_index = {}
+        old_file = None
+
+    conn = connect()
+    cur = conn.cursor()
+
+    try:
+        fingerprints = fetch_fingerprints(cur)
+        changed = [int(event_id) for event_id, fingerprint in fingerprints.items()
+                   if old_index.get(int(event_id), {}).get("fingerprint") != fingerprint]
+        changed_ids = set(changed)
+        removed = [event_id for event_id in old_index if str(event_id) not in fingerprints]
+
+        def merged():
+            # Оба потока упорядочены по id, поэтому слияние идет за один проход
+            fresh = extract_conferences(conn, changed, workers)
+            next_fresh = next(fresh, None)
+            try:
+                for event_id in map(int, fingerprints):
+                    if next_fresh is not None and next_fresh.id == event_id:
+                        yield next_fresh
+                        next_fresh = next(fresh, None)
+                    elif event_id not in changed_ids:
+                        yield read_snapshot_conference(old_file, old_index[event_id])
+            finally:
+                # Старый снимок закрывается до замены файла в write_snapshot:
+                # открытый файл нельзя заменить в Windows
+                if old_file:
+                    old_file.close()
+
+        write_snapshot(json_file_path, merged(), fingerprints)
+    finally:
+        if old_file:
+            old_file.close()
+        cur.close()
+        conn.close()
 
+    return changed, removed
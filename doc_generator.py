@@ -1,8 +1,21 @@
+import copy
+import hashlib
+import io
 import json
+import zipfile
+from datetime import datetime
 from docx import Document
 from docx.shared import Pt, Cm, Inches
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
 import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import instrumentation
+from docx_stream import DOCUMENT_PART, StreamingDocument
+from render_plan import as_render_plan
 
 def set_page_layout(doc):
     """Настройка размера бумаги A4 и полей 1 дюйм."""
@@ -14,322 +27,555 @@ def set_page_layout(doc):
     section.top_margin = Inches(1)
     section.bottom_margin = Inches(1)
 
-def safe_get(dct, *keys):
-    """Безопасное получение значения из вложенного словаря. Возвращает '' если нет."""
-    for key in keys:
-        if dct and key in dct:
-            dct = dct[key]
-        else:
-            return ''
-    return dct
-
-def create_program_docx(data, output_dir):
-    """Генерация документа программы конференции."""
+# Версия оформления документов. Входит в отпечатки кэша готовых файлов:
+# при изменении генераторов ее нужно увеличить, чтобы документы пересоздались.
+TEMPLATE_VERSION = 2
+
+# Фиксированные даты в свойствах документа и в zip-архиве, чтобы одинаковые
+# данные давали побайтно одинаковые файлы
+FIXED_DOCUMENT_DATE = datetime(2000, 1, 1)
+FIXED_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+MANIFEST_FILENAME = '.manifest.json'
+FRAGMENTS_DIRNAME = '.fragments'
+PROGRAM_FILENAME = '1_Программа_к43.docx'
+PUBLICATION_LIST_FILENAME = '3_Список представляемых к публикации докладов.docx'
+
+# Начиная с этого числа докладов программа и отчет строятся потоково
+# (docx_stream.StreamingDocument): тело документа пишется во временный файл
+# по абзацам и строкам таблиц, а не держится в памяти целиком
+STREAMING_MIN_CONTRIBUTIONS = 1000
+
+# Кэш фрагментов заседаний (FragmentCache, параметр fragments генераторов):
+# XML каждого заседания программы и отчета хранится в output_dir/.fragments
+# под отпечатком данных заседания, и при повторной генерации неизменившиеся
+# заседания вставляются в document.xml готовыми. Фрагменты пишутся и
+# вставляются через StreamingDocument, поэтому с кэшем эти документы всегда
+# строятся потоково.
+
+# Именованные стили абзацев: имя -> оформление (размер шрифта в пунктах,
+# начертание, выравнивание, отступы в сантиметрах). Стили основаны на
+# 'Normal' и добавляются в шаблон; абзацы ссылаются на стиль, а не
+# оформляются каждый напрямую, поэтому у абзацев и их фрагментов текста
+# нет собственных pPr/rPr с повторяющимися свойствами.
+PARAGRAPH_STYLES = {
+    'Document Title': dict(alignment=WD_ALIGN_PARAGRAPH.CENTER, bold=True, italic=True),
+    'Centered Heading': dict(alignment=WD_ALIGN_PARAGRAPH.CENTER, bold=True),
+    'Section Heading': dict(alignment=WD_ALIGN_PARAGRAPH.LEFT, left_indent=1.25, bold=True, italic=True,
+                            size=12),
+    'Leadership': dict(left_indent=2.0, size=12),
+    'Leadership Affiliation': dict(left_indent=2.0),
+    'Session Heading': dict(bold=True),
+    'Session Details': dict(bold=True, size=12),
+    'Note': dict(alignment=WD_ALIGN_PARAGRAPH.JUSTIFY, italic=True),
+    'Indented Note': dict(alignment=WD_ALIGN_PARAGRAPH.JUSTIFY, first_line_indent=1.27, italic=True),
+    'Contribution Speaker': dict(left_indent=1.25, first_line_indent=-0.63, keep_with_next=True),
+    'Contribution Title': dict(alignment=WD_ALIGN_PARAGRAPH.JUSTIFY, first_line_indent=1.27),
+    'Table Heading': dict(alignment=WD_ALIGN_PARAGRAPH.CENTER, bold=True),
+    'Table Text': dict(alignment=WD_ALIGN_PARAGRAPH.CENTER),
+}
+
+def style_id(name):
+    """Идентификатор стиля в документе (python-docx убирает из имени пробелы)."""
+    return name.replace(' ', '')
+
+def add_paragraph_styles(doc):
+    """Добавление стилей PARAGRAPH_STYLES в документ."""
+    normal = doc.styles['Normal']
+    for name, formatting in PARAGRAPH_STYLES.items():
+        style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = normal
+        style.quick_style = True
+        paragraph_format = style.paragraph_format
+        paragraph_format.alignment = formatting.get('alignment')
+        if 'left_indent' in formatting:
+            paragraph_format.left_indent = Cm(formatting['left_indent'])
+        if 'first_line_indent' in formatting:
+            paragraph_format.first_line_indent = Cm(formatting['first_line_indent'])
+        if formatting.get('keep_with_next'):
+            paragraph_format.keep_with_next = True
+        style.font.bold = formatting.get('bold')
+        style.font.italic = formatting.get('italic')
+        if 'size' in formatting:
+            style.font.size = Pt(formatting['size'])
+
+def add_styled_paragraph(doc, text='', style=None):
+    """Абзац со стилем style из PARAGRAPH_STYLES.
+
+    Ссылка на стиль ставится по идентификатору: doc.add_paragraph(text, style)
+    искал бы стиль по имени среди всех стилей документа на каждый абзац.
+    """
+    p = doc.add_paragraph(text)
+    if style is not None:
+        p._p.style = style_id(style)
+    return p
+
+# Подготовленные шаблоны документов по размеру шрифта стиля 'Normal'.
+# Заполняются один раз на процесс, каждый документ строится из копии.
+TEMPLATE_CACHE = {}
+
+def prepare_template(font_size):
+    """Пустой документ A4 со шрифтом Times New Roman, без интервалов и со
+    стилями PARAGRAPH_STYLES."""
     doc = Document()
     set_page_layout(doc)
 
     style = doc.styles['Normal']
     style.font.name = 'Times New Roman'
-    style.font.size = Pt(14)
+    style.font.size = Pt(font_size)
     style.paragraph_format.space_before = Pt(0)
     style.paragraph_format.space_after = Pt(0)
+    add_paragraph_styles(doc)
+
+    props = doc.core_properties
+    props.created = FIXED_DOCUMENT_DATE
+    props.modified = FIXED_DOCUMENT_DATE
+    props.last_printed = FIXED_DOCUMENT_DATE
+    return doc
+
+def save_document(doc, path):
+    """Детерминированное сохранение документа.
+
+    python-docx записывает в zip текущее время; здесь архив пересобирается
+    с фиксированной датой у всех файлов и атомарно заменяет path.
+    Для StreamingDocument document.xml берется из его временного файла
+    и копируется в архив частями.
+    """
+    document_xml = None
+    if isinstance(doc, StreamingDocument):
+        document_xml = doc.finish()
+        doc = doc.doc
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(buffer) as src, zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            info = zipfile.ZipInfo(item.filename, date_time=FIXED_ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            if document_xml is not None and item.filename == DOCUMENT_PART:
+                with dst.open(info, 'w') as entry:
+                    shutil.copyfileobj(document_xml, entry)
+                document_xml.close()
+            else:
+                dst.writestr(info, src.read(item.filename))
+    os.replace(tmp_path, path)
+
+def new_document(font_size, streaming=False):
+    """Новый документ - копия подготовленного шаблона из кэша.
+
+    deepcopy готового шаблона обходится дешевле, чем повторная загрузка
+    пакета по умолчанию и настройка стилей. При streaming копия
+    оборачивается в StreamingDocument.
+    """
+    template = TEMPLATE_CACHE.get(font_size)
+    if template is None:
+        template = TEMPLATE_CACHE[font_size] = prepare_template(font_size)
+    doc = copy.deepcopy(template)
+    return StreamingDocument(doc) if streaming else doc
+
+def use_streaming(plan):
+    """Строить ли документы конференции потоково (см. STREAMING_MIN_CONTRIBUTIONS)."""
+    return plan.contribution_count >= STREAMING_MIN_CONTRIBUTIONS
+
+def safe_filename(name):
+    """Замена недопустимых в именах файлов символов на '_'."""
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .")
+
+def report_filename(data):
+    """Имя файла отчета (содержит название конференции)."""
+    return safe_filename(f'2_Отчет о проведении {data.title}') + '.docx'
+
+class FragmentCache:
+    """Фрагменты document.xml одного вида документа в output_dir/.fragments.
+
+    Фрагмент - XML элементов тела, построенных одной функцией (заседание),
+    в файле '{вид}-{отпечаток входных данных}.xml'. Отпечаток учитывает
+    TEMPLATE_VERSION. Фрагменты, не использованные при последней генерации
+    документа, удаляет prune().
+    """
+
+    def __init__(self, output_dir, kind):
+        self.dir = os.path.join(output_dir, FRAGMENTS_DIRNAME)
+        self.kind = kind
+        self.used = set()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def add(self, doc, inputs, render, *args):
+        """Вставка в StreamingDocument doc фрагмента для inputs; при промахе
+        фрагмент строится вызовом render(*args) и сохраняется."""
+        name = f'{self.kind}-{document_fingerprint(inputs)}.xml'
+        self.used.add(name)
+        path = os.path.join(self.dir, name)
+        try:
+            with open(path, 'rb') as f:
+                doc.write_xml(f.read())
+            return
+        except FileNotFoundError:
+            pass
+        position = doc.mark()
+        render(*args)
+        xml = doc.xml_since(position)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(xml)
+        os.replace(f'{path}.tmp', path)
+
+    def prune(self):
+        for name in os.listdir(self.dir):
+            if name.startswith(f'{self.kind}-') and name not in self.used:
+                os.remove(os.path.join(self.dir, name))
+
+def fragment_cache(output_dir, kind, enabled):
+    """FragmentCache документа kind или None, если кэш фрагментов выключен."""
+    return FragmentCache(output_dir, kind) if enabled else None
+
+def add_session(doc, cache, inputs, render, *args):
+    """Заседание документа: из кэша фрагментов или построением render(*args)."""
+    if cache is None:
+        render(*args)
+    else:
+        cache.add(doc, inputs, render, *args)
+
+def add_program_entries(doc, entries):
+    """Доклады заседания в программе: номер, докладчик и название."""
+    for entry in entries:
+        add_styled_paragraph(doc, entry.heading, 'Contribution Speaker')
+        add_styled_paragraph(doc, entry.title, 'Contribution Title')
+        doc.add_paragraph()
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run(f'Программа\n{data.get("title","")} по кафедре № 43 компьютерных технологий и программной инженерии')
-    run.bold = True
-    run.italic = True
-    run.font.name = 'Times New Roman'
-    run.font.size = Pt(14)
+# Генераторы документов (DOCUMENTS) принимают render_plan.RenderPlan,
+# models.Conference или словарь в формате снимка; все, кроме плана,
+# преобразуется в план через as_render_plan
 
-    doc.add_paragraph()
+@instrumentation.traced("render")
+def create_program_docx(data, output_dir, fragments=True):
+    """Генерация документа программы конференции (fragments - кэш фрагментов заседаний)."""
+    plan = as_render_plan(data)
+    cache = fragment_cache(output_dir, 'program', fragments)
+    doc = new_document(14, cache is not None or use_streaming(plan))
 
-    p = doc.add_paragraph('Секция каф.43. «компьютерных технологий и программной инженерии»')
-    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    p.paragraph_format.left_indent = Cm(1.25)
-    run = p.runs[0]
-    run.bold = True
-    run.italic = True
-    run.font.size = Pt(12)
-
-    leadership = data.get('leadership', {})
-    p = doc.add_paragraph(f'Научный руководитель секции – {safe_get(leadership, "scientific_leader", "name")}')
-    p.paragraph_format.left_indent = Cm(2.0)
-    p.runs[0].font.size = Pt(12)
-    aff = safe_get(leadership, "scientific_leader", "affiliation")
-    if aff:
-        doc.add_paragraph(aff).paragraph_format.left_indent = Cm(2.0)
-
-    p = doc.add_paragraph(f'Зам. научного руководителя секции – {safe_get(leadership, "deputy_leader", "name")}')
-    p.paragraph_format.left_indent = Cm(2.0)
-    p.runs[0].font.size = Pt(12)
-    aff = safe_get(leadership, "deputy_leader", "affiliation")
-    if aff:
-        doc.add_paragraph(aff).paragraph_format.left_indent = Cm(2.0)
-
-    p = doc.add_paragraph(f'Секретарь – {safe_get(leadership, "secretary", "name")}')
-    p.paragraph_format.left_indent = Cm(2.0)
-    p.runs[0].font.size = Pt(12)
-    aff = safe_get(leadership, "secretary", "affiliation")
-    if aff:
-        doc.add_paragraph(aff).paragraph_format.left_indent = Cm(2.0)
+    add_styled_paragraph(
+        doc, f'Программа\n{plan.title} по кафедре № 43 компьютерных технологий и программной инженерии',
+        'Document Title'
+    )
 
     doc.add_paragraph()
 
-    for session in data.get('sessions', []):
-        p = doc.add_paragraph(f'Заседание {session.get("number","")}.')
-        p.runs[0].bold = True
-        p.runs[0].font.size = Pt(14)
-
-        p = doc.add_paragraph(f'{session.get("date","")}, {session.get("start_time","")}, {session.get("room_name","")}')
-        p.runs[0].bold = True
-        p.runs[0].font.size = Pt(12)
+    add_styled_paragraph(doc, 'Секция каф.43. «компьютерных технологий и программной инженерии»',
+                         'Section Heading')
 
-        doc.add_paragraph()
-
-        p = doc.add_paragraph('По решению руководителя секции порядок следования докладов может быть изменен.')
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        p.runs[0].italic = True
-        p.runs[0].font.size = Pt(14)
-
-        doc.add_paragraph()
+    for label, leader in (('Научный руководитель секции', plan.scientific_leader),
+                          ('Зам. научного руководителя секции', plan.deputy_leader),
+                          ('Секретарь', plan.secretary)):
+        add_styled_paragraph(doc, f'{label} – {leader.name}', 'Leadership')
+        if leader.affiliation:
+            add_styled_paragraph(doc, leader.affiliation, 'Leadership Affiliation')
 
-        index = 1
-        non_submitted_or_rejected = []
-        for contribution in session.get('contributions', []):
-            if contribution.get('review_state') in ['not submitted', 'rejected']:
-                non_submitted_or_rejected.append(contribution)
-                continue
-            speaker = contribution.get("speaker", {})
-            full_name = speaker.get("full_name","")
-            affiliation = speaker.get("affiliation","")
-            p = doc.add_paragraph(f'{index}. {full_name}, {affiliation}')
-            p.paragraph_format.left_indent = Cm(1.25)
-            p.paragraph_format.first_line_indent = Cm(-0.63)
-            p.paragraph_format.keep_with_next = True
-            p.runs[0].font.size = Pt(14)
-
-            p = doc.add_paragraph(contribution.get('title',''))
-            p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-            p.paragraph_format.first_line_indent = Cm(1.27)
-            p.runs[0].font.size = Pt(14)
-            doc.add_paragraph()
-            index += 1
+    doc.add_paragraph()
 
-        if non_submitted_or_rejected:
+    for session in plan.sessions:
+        add_session(doc, cache, program_session_inputs(session), add_program_session, doc, session)
+        if session is not plan.sessions[-1]:
             doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
-            p = doc.add_paragraph('Следующие далее студенты своевременно не зарегистрировались для участия в конференции. По решению руководителя секции их доклад может быть перенесен на более позднюю дату.')
-            p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-            p.paragraph_format.first_line_indent = Cm(1.27)
-            p.runs[0].italic = True
-            p.runs[0].font.size = Pt(14)
 
-            doc.add_paragraph()
+    save_document(doc, os.path.join(output_dir, PROGRAM_FILENAME))
+    if cache is not None:
+        cache.prune()
 
-            for contribution in non_submitted_or_rejected:
-                speaker = contribution.get("speaker", {})
-                full_name = speaker.get("full_name","")
-                affiliation = speaker.get("affiliation","")
-                p = doc.add_paragraph(f'{index}. {full_name}, {affiliation}')
-                p.paragraph_format.left_indent = Cm(1.25)
-                p.paragraph_format.first_line_indent = Cm(-0.63)
-                p.paragraph_format.keep_with_next = True
-                p.runs[0].font.size = Pt(14)
-
-                p = doc.add_paragraph(contribution.get('title',''))
-                p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                p.paragraph_format.first_line_indent = Cm(1.27)
-                p.runs[0].font.size = Pt(14)
-                doc.add_paragraph()
-                index += 1
-
-        if session != data.get('sessions', [])[-1]:
-            doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+def add_program_session(doc, session):
+    """Заседание в программе: заголовок, доклады и незарегистрированные доклады."""
+    add_styled_paragraph(doc, f'Заседание {session.number}.', 'Session Heading')
+    add_styled_paragraph(doc, f'{session.date}, {session.start_time}, {session.room_name}', 'Session Details')
 
-    doc.save(os.path.join(output_dir, '1_Программа_к43.docx'))
+    doc.add_paragraph()
 
-# Для функций create_report_docx и create_publication_list_docx точно так же использовать safe_get для leadership
-# и .get() для всех остальных данных
+    add_styled_paragraph(doc, 'По решению руководителя секции порядок следования докладов может быть изменен.',
+                         'Note')
 
-def create_report_docx(data, output_dir):
-    """Генерация документа отчета конференции с адресом из JSON."""
-    doc = Document()
-    set_page_layout(doc)
+    doc.add_paragraph()
 
-    style = doc.styles['Normal']
-    style.font.name = 'Times New Roman'
-    style.font.size = Pt(10)
-    style.paragraph_format.space_before = Pt(0)
-    style.paragraph_format.space_after = Pt(0)
+    add_program_entries(doc, session.program)
 
-    doc.add_paragraph()
+    if session.unregistered:
+        doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        add_styled_paragraph(doc, 'Следующие далее студенты своевременно не зарегистрировались для участия в конференции. По решению руководителя секции их доклад может быть перенесен на более позднюю дату.',
+                             'Indented Note')
 
-    p = doc.add_paragraph(f'Отчет о проведении {data.get("title","")}')
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.runs[0].bold = True
+        doc.add_paragraph()
+
+        add_program_entries(doc, session.unregistered)
+
+def add_table_rows(doc, table, rows, style):
+    """Быстрое добавление строк в таблицу.
+
+    Через python-docx строится только одна строка-шаблон (абзацы ячеек
+    со стилем style). Остальные строки - копии ее элемента <w:tr>,
+    в которые подставляется текст, так что table.add_row() и row.cells,
+    обходящие всю сетку таблицы, не вызываются для каждой строки.
+    Результат совпадает с построчным заполнением. В StreamingDocument
+    строки сразу записываются в файл и в дерево не добавляются.
+    """
+    template = table.add_row()
+    for cell in template.cells:
+        p = cell.paragraphs[0]
+        p._p.style = style_id(style)
+        p.add_run('')
+    tbl = table._tbl
+    template_tr = template._tr
+    tbl.remove(template_tr)
+
+    for values in rows:
+        tr = copy.deepcopy(template_tr)
+        for r, text in zip(tr.xpath('./w:tc/w:p/w:r'), values):
+            if text:
+                r.text = text
+        if isinstance(doc, StreamingDocument):
+            doc.write_row(table, tr)
+        else:
+            tbl.append(tr)
 
-    p = doc.add_paragraph('Секция 43. Кафедра компьютерных технологий и программной инженерии')
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.runs[0].bold = True
+@instrumentation.traced("render")
+def create_report_docx(data, output_dir, fragments=True):
+    """Генерация документа отчета конференции с адресом из JSON (fragments - кэш фрагментов заседаний)."""
+    plan = as_render_plan(data)
+    cache = fragment_cache(output_dir, 'report', fragments)
+    doc = new_document(10, cache is not None or use_streaming(plan))
 
     doc.add_paragraph()
 
-    leadership = data.get('leadership', {})
-    conference_address = data.get('address', '')
+    add_styled_paragraph(doc, f'Отчет о проведении {plan.title}', 'Centered Heading')
+    add_styled_paragraph(doc, 'Секция 43. Кафедра компьютерных технологий и программной инженерии',
+                         'Centered Heading')
 
-    for session in data.get('sessions', []):
-        p = doc.add_paragraph(f'Заседание {session.get("number","")}')
-        p.runs[0].bold = True
+    doc.add_paragraph()
 
-        room_name = session.get("room_name", "")
-        p = doc.add_paragraph(f'{session.get("date","")} г., {session.get("start_time","")}, {conference_address}, {room_name}')
-        p.runs[0].font.size = Pt(10)
+    for session in plan.sessions:
+        add_session(doc, cache, report_session_inputs(plan, session), add_report_session, doc, plan, session)
+        if session is not plan.sessions[-1]:
+            doc.add_paragraph()
 
-        sci_leader_name = safe_get(leadership, "scientific_leader", "name")
-        sci_leader_aff = safe_get(leadership, "scientific_leader", "affiliation")
-        sec_name = safe_get(leadership, "secretary", "name")
-        sec_aff = safe_get(leadership, "secretary", "affiliation")
+    save_document(doc, os.path.join(output_dir, report_filename(plan)))
+    if cache is not None:
+        cache.prune()
 
-        if sci_leader_name or sci_leader_aff:
-            p = doc.add_paragraph(f'Научный руководитель секции – {sci_leader_aff} {sci_leader_name}'.strip())
-            p.runs[0].font.size = Pt(10)
+def add_report_session(doc, plan, session):
+    """Заседание в отчете: заголовок, руководители, таблица докладов и подпись."""
+    add_styled_paragraph(doc, f'Заседание {session.number}', 'Session Heading')
+    doc.add_paragraph(f'{session.date} г., {session.start_time}, {plan.address}, {session.room_name}')
 
-        if sec_name or sec_aff:
-            p = doc.add_paragraph(f'Секретарь – {sec_aff} {sec_name}'.strip())
-            p.runs[0].font.size = Pt(10)
+    for line in (plan.report_leader_line, plan.report_secretary_line):
+        if line:
+            doc.add_paragraph(line)
 
-        doc.add_paragraph()
+    doc.add_paragraph()
 
-        doc.add_paragraph('Список докладов')
-        doc.add_paragraph()
+    doc.add_paragraph('Список докладов')
+    doc.add_paragraph()
 
-        table = doc.add_table(rows=1, cols=4)
-        table.style = 'Table Grid'
-        table.autofit = False
-        table.columns[0].width = Cm(1.0)
-        table.columns[1].width = Cm(9.0)
-        table.columns[2].width = Cm(2.92)
-        table.columns[3].width = Cm(3.0)
-
-        headers = ['№ п/п', 'Фамилия и инициалы докладчика, название доклада', 'Статус (магистр / студент)', 'Решение']
-        for i, header in enumerate(headers):
-            cell = table.rows[0].cells[i]
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(header)
-            run.bold = True
-            run.font.size = Pt(10)
-
-        for i, contribution in enumerate(session.get('contributions', []), 1):
-            row = table.add_row()
-            cell = row.cells[0]
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            p.add_run(str(i)).font.size = Pt(10)
-
-            cell = row.cells[1]
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            speaker = contribution.get("speaker", {})
-            p.add_run(f'{speaker.get("full_name","")}. {contribution.get("title","")}').font.size = Pt(10)
-
-            cell = row.cells[2]
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            aff = speaker.get("affiliation","")
-            status = 'Магистрант' if 'Магистрант' in aff else 'Студент'
-            gr_num = aff.split("гр.")[1].strip() if "гр." in aff else ""
-            p.add_run(f'{status} {gr_num}').font.size = Pt(10)
-
-            cell = row.cells[3]
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            p.add_run('').font.size = Pt(10)
+    table = doc.add_table(rows=1, cols=4)
+    table.style = 'Table Grid'
+    table.autofit = False
+    table.columns[0].width = Cm(1.0)
+    table.columns[1].width = Cm(9.0)
+    table.columns[2].width = Cm(2.92)
+    table.columns[3].width = Cm(3.0)
 
-        doc.add_paragraph()
-        doc.add_paragraph()
+    headers = ['№ п/п', 'Фамилия и инициалы докладчика, название доклада', 'Статус (магистр / студент)', 'Решение']
+    for i, header in enumerate(headers):
+        p = table.rows[0].cells[i].paragraphs[0]
+        p._p.style = style_id('Table Heading')
+        p.add_run(header)
 
-        if sci_leader_name:
-            p = doc.add_paragraph(f'Научный руководитель секции _________________ / {sci_leader_name}')
-            p.runs[0].font.size = Pt(10)
+    add_table_rows(doc, table, session.report_rows, 'Table Text')
 
-        if session != data.get('sessions', [])[-1]:
-            doc.add_paragraph()
+    doc.add_paragraph()
+    doc.add_paragraph()
 
-    doc.save(os.path.join(output_dir, f'2_Отчет о проведении {data.get("title","")}.docx'))
+    if plan.scientific_leader.name:
+        doc.add_paragraph(f'Научный руководитель секции _________________ / {plan.scientific_leader.name}')
 
 
-def create_publication_list_docx(data, output_dir):
-    """Генерация документа списка докладов для публикации."""
-    doc = Document()
-    set_page_layout(doc)
+@instrumentation.traced("render")
+def create_publication_list_docx(data, output_dir, fragments=True):
+    """Генерация документа списка докладов для публикации.
 
-    style = doc.styles['Normal']
-    style.font.name = 'Times New Roman'
-    style.font.size = Pt(14)
-    style.paragraph_format.space_before = Pt(0)
-    style.paragraph_format.space_after = Pt(0)
+    Заседаний в списке нет, fragments принимается для общей сигнатуры генераторов.
+    """
+    plan = as_render_plan(data)
+    doc = new_document(14)
 
-    p = doc.add_paragraph('Список представляемых к публикации докладов')
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.runs[0].bold = True
-    p.runs[0].italic = True
+    add_styled_paragraph(doc, 'Список представляемых к публикации докладов', 'Document Title')
 
     doc.add_paragraph()
 
-    leadership = data.get('leadership', {})
-    sec_name = safe_get(leadership, "secretary", "name")
-    sec_aff = safe_get(leadership, "secretary", "affiliation")
-    p = doc.add_paragraph('Кафедра № 43 компьютерных технологий и программной инженерии')
-    p.paragraph_format.left_indent = Cm(2.0)
-    p.runs[0].font.size = Pt(12)
+    sec_name = plan.secretary.name
+    sec_email = plan.secretary.email
+    add_styled_paragraph(doc, 'Кафедра № 43 компьютерных технологий и программной инженерии', 'Leadership')
 
     if sec_name:
-        p = doc.add_paragraph(sec_name)
-        p.paragraph_format.left_indent = Cm(2.0)
-        p.runs[0].font.size = Pt(12)
+        add_styled_paragraph(doc, sec_name, 'Leadership')
 
-    if leadership.get("secretary", {}).get("email"):
-        p = doc.add_paragraph(f'e-mail: {leadership["secretary"]["email"]}')
-        p.paragraph_format.left_indent = Cm(2.0)
-        p.runs[0].font.size = Pt(12)
+    if sec_email:
+        add_styled_paragraph(doc, f'e-mail: {sec_email}', 'Leadership')
 
-    p = doc.add_paragraph('тел.:')
-    p.paragraph_format.left_indent = Cm(2.0)
-    p.runs[0].font.size = Pt(12)
+    add_styled_paragraph(doc, 'тел.:', 'Leadership')
 
     doc.add_paragraph()
 
-    accepted_contributions = []
-    for session in data.get('sessions', []):
-        for contribution in session.get('contributions', []):
-            if contribution.get('review_state') == 'accepted':
-                accepted_contributions.append(contribution)
-
-    for i, contribution in enumerate(accepted_contributions, 1):
-        speaker = contribution.get("speaker", {})
-        first_name_parts = speaker.get("first_name","").split()
-        last_name = speaker.get("last_name","")
-        initials = f'{first_name_parts[0][0]}. {first_name_parts[1][0]}.' if len(first_name_parts) > 1 else f'{first_name_parts[0][0]}.' if first_name_parts else ''
-        speaker_name = f'{last_name} {initials}'.strip()
-        p = doc.add_paragraph(f'{i}. {speaker_name}. {contribution.get("title","")}')
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        p.paragraph_format.first_line_indent = Cm(1.27)
-        p.runs[0].font.size = Pt(14)
+    for line in plan.publications:
+        add_styled_paragraph(doc, line, 'Contribution Title')
         doc.add_paragraph()
 
     doc.add_paragraph()
 
     if sec_name:
-        p = doc.add_paragraph(f'Руководитель УНИДС _________________ / {sec_name}')
-        p.paragraph_format.left_indent = Cm(2.0)
-        p.runs[0].font.size = Pt(12)
-
-    doc.save(os.path.join(output_dir, '3_Список представляемых к публикации докладов.docx'))
-
-def create_conference_docx(data, output_dir):
-    """Создание всех трех DOCX документов."""
-    create_program_docx(data, output_dir)
-    create_report_docx(data, output_dir)
-    create_publication_list_docx(data, output_dir)
-
+        add_styled_paragraph(doc, f'Руководитель УНИДС _________________ / {sec_name}', 'Leadership')
+
+    save_document(doc, os.path.join(output_dir, PUBLICATION_LIST_FILENAME))
+
+def session_inputs(session):
+    return [session.number, session.date, session.start_time, session.room_name]
+
+def program_session_inputs(session):
+    """Данные, от которых зависит заседание в программе (фрагмент и документ)."""
+    return session_inputs(session) + [
+        [[entry.heading, entry.title] for entry in session.program],
+        [[entry.heading, entry.title] for entry in session.unregistered]
+    ]
+
+def report_session_inputs(plan, session):
+    """Данные, от которых зависит фрагмент заседания в отчете."""
+    return [plan.address, plan.report_leader_line, plan.report_secretary_line,
+            plan.scientific_leader.name] + session_inputs(session) + [session.report_rows]
+
+def program_inputs(plan):
+    """Данные, от которых зависит программа конференции."""
+    return {
+        "title": plan.title,
+        "leadership": [[leader.name, leader.affiliation]
+                       for leader in (plan.scientific_leader, plan.deputy_leader, plan.secretary)],
+        "sessions": [program_session_inputs(session) for session in plan.sessions]
+    }
+
+def report_inputs(plan):
+    """Данные, от которых зависит отчет о проведении конференции."""
+    return {
+        "title": plan.title,
+        "address": plan.address,
+        "leadership": [plan.report_leader_line, plan.report_secretary_line, plan.scientific_leader.name],
+        "sessions": [session_inputs(session) + [session.report_rows] for session in plan.sessions]
+    }
+
+def publication_list_inputs(plan):
+    """Данные списка к публикации: секретарь и принятые доклады."""
+    return {
+        "secretary": [plan.secretary.name, plan.secretary.email],
+        "accepted": plan.publications
+    }
+
+def document_fingerprint(inputs):
+    """Отпечаток входных данных документа с учетом версии оформления."""
+    payload = json.dumps([TEMPLATE_VERSION, inputs], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Документы конференции в порядке нумерации файлов:
+# (генератор, данные для отпечатка, имя файла)
+DOCUMENTS = (
+    (create_program_docx, program_inputs, lambda data: PROGRAM_FILENAME),
+    (create_report_docx, report_inputs, report_filename),
+    (create_publication_list_docx, publication_list_inputs, lambda data: PUBLICATION_LIST_FILENAME),
+)
+
+# Документы по именам, используемым в адресах сервиса и в режиме слежения
+DOCUMENT_KINDS = dict(zip(("program", "report", "publications"), DOCUMENTS))
+
+def load_manifest(output_dir):
+    """Отпечатки ранее созданных документов: {имя файла: отпечаток}."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+class DocumentGenerationError(Exception):
+    """Ошибка генерации одного или нескольких документов конференции."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"{name}: {error}" for name, error in errors.items())
+        super().__init__(f"не удалось создать документы ({details})")
+
+def create_conference_docx(data, output_dir, mode="process", use_cache=True, kinds=None, fragments=True):
+    """Создание всех трех DOCX документов.
+
+    План генерации (render_plan.RenderPlan) строится один раз и
+    передается всем генераторам. Для каждого документа считается отпечаток
+    только тех полей, которые он использует; отпечатки хранятся в манифесте
+    в output_dir. При use_cache документ пересоздается, только если его
+    отпечаток изменился или файла нет; заседания пересоздаваемых программы
+    и отчета берутся из кэша фрагментов (FragmentCache), если их данные не
+    изменились; fragments=False выключает этот кэш. kinds ограничивает набор
+    документов именами из DOCUMENT_KINDS.
+    Возвращает список имен пересозданных файлов.
+
+    Документы независимы и строятся одновременно: mode="process" (по
+    умолчанию) - в пуле процессов, "thread" - в пуле потоков, None -
+    последовательно. Ошибка одного документа не мешает созданию остальных;
+    после завершения всех генераторов ошибки собираются в
+    DocumentGenerationError.
+    """
+    plan = as_render_plan(data)
+    if not use_cache:
+        # Без кэша документов не используются и фрагменты заседаний
+        shutil.rmtree(os.path.join(output_dir, FRAGMENTS_DIRNAME), ignore_errors=True)
+    manifest = load_manifest(output_dir)
+    pending = []
+    for kind, (generator, inputs, filename) in DOCUMENT_KINDS.items():
+        if kinds is not None and kind not in kinds:
+            continue
+        name = filename(plan)
+        fingerprint = document_fingerprint(inputs(plan))
+        if (use_cache and manifest.get(name) == fingerprint
+                and os.path.exists(os.path.join(output_dir, name))):
+            continue
+        pending.append((generator, name, fingerprint))
+
+    errors = {}
+    if mode is None or len(pending) <= 1:
+        for generator, name, fingerprint in pending:
+            try:
+                generator(plan, output_dir, fragments)
+                manifest[name] = fingerprint
+            except Exception as e:
+                errors[generator.__name__] = e
+    else:
+        executor_class = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+        # Интервалы трассировки из дочерних процессов передаются с результатом
+        traced = mode == "process" and instrumentation.ENABLED
+        with executor_class(max_workers=len(pending)) as executor:
+            futures = [
+                (generator, name, fingerprint,
+                 executor.submit(instrumentation.call_traced, instrumentation.STARTED, generator, plan, output_dir,
+                                 fragments)
+                 if traced else executor.submit(generator, plan, output_dir, fragments))
+                for generator, name, fingerprint in pending
+            ]
+            for generator, name, fingerprint, future in futures:
+                try:
+                    result = future.result()
+                    if traced:
+                        instrumentation.merge(result[1])
+                    manifest[name] = fingerprint
+                except Exception as e:
+                    errors[generator.__name__] = e
+
+    if pending:
+        save_manifest(output_dir, manifest)
+    if errors:
+        raise DocumentGenerationError(errors)
+    return [name for generator, name, fingerprint in pending if generator.__name__ not in errors]
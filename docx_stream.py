@@ -0,0 +1,104 @@
+import tempfile
+
+from lxml import etree
+
+DOCUMENT_PART = "word/document.xml"
+
+class StreamingDocument:
+    """Документ, тело которого записывается во временный файл по мере построения.
+
+    Поддерживает ту часть интерфейса python-docx Document, которой
+    пользуются генераторы: add_paragraph и add_table. Перед добавлением
+    нового элемента все предыдущие элементы тела считаются готовыми:
+    они сериализуются и удаляются из дерева, так что в памяти находится
+    только последний абзац (или строка таблицы, см. write_row).
+
+    Элементы сериализуются так же, как в document.xml целиком:
+    объявления пространств имен, которые уже есть у корня w:document,
+    с начального тега элемента убираются, поэтому document.xml совпадает
+    побайтно с тем, что записал бы python-docx.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.body = doc.element.body
+        self.sect_pr = self.body.sectPr
+        self.declarations = [
+            f' xmlns:{prefix}="{uri}"'.encode() for prefix, uri in doc.element.nsmap.items() if prefix
+        ]
+        xml = etree.tostring(doc.element, encoding="UTF-8", standalone=True)
+        split = xml.index(b"<w:sectPr")
+        self.tail = xml[split:]
+        self.stream = tempfile.TemporaryFile()
+        self.stream.write(xml[:split])
+        self.table = None
+
+    def element_xml(self, element):
+        xml = etree.tostring(element, encoding="UTF-8", xml_declaration=False)
+        end = xml.index(b">")
+        start_tag = xml[:end]
+        for declaration in self.declarations:
+            start_tag = start_tag.replace(declaration, b"", 1)
+        return start_tag + xml[end:]
+
+    def flush(self):
+        """Запись всех элементов тела, кроме sectPr, и удаление их из дерева."""
+        for element in list(self.body):
+            if element is self.sect_pr:
+                continue
+            if element is self.table:
+                self.stream.write(b"</w:tbl>")
+                self.table = None
+            else:
+                self.stream.write(self.element_xml(element))
+            self.body.remove(element)
+
+    def add_paragraph(self, text="", style=None):
+        self.flush()
+        return self.doc.add_paragraph(text, style)
+
+    def add_table(self, rows, cols, style=None):
+        self.flush()
+        return self.doc.add_table(rows, cols, style)
+
+    def write_row(self, table, tr):
+        """Запись строки <w:tr> в конец таблицы table без добавления в дерево.
+
+        При первой строке записывается начало таблицы (свойства, сетка и
+        уже добавленные строки, например заголовок); таблица остается в
+        теле пустой и закрывается при следующем flush.
+        """
+        tbl = table._tbl
+        if self.table is not tbl:
+            xml = self.element_xml(tbl)
+            self.stream.write(xml[:xml.rindex(b"</w:tbl>")])
+            for child in list(tbl):
+                tbl.remove(child)
+            self.table = tbl
+        self.stream.write(self.element_xml(tr))
+
+    def mark(self):
+        """Позиция в document.xml после всех построенных элементов (для xml_since)."""
+        self.flush()
+        return self.stream.tell()
+
+    def xml_since(self, position):
+        """XML элементов тела, построенных после mark() с позицией position."""
+        self.flush()
+        end = self.stream.tell()
+        self.stream.seek(position)
+        xml = self.stream.read(end - position)
+        self.stream.seek(end)
+        return xml
+
+    def write_xml(self, xml):
+        """Запись готового XML элементов тела (например, полученного xml_since)."""
+        self.flush()
+        self.stream.write(xml)
+
+    def finish(self):
+        """Завершение document.xml; возвращает файл с ним, открытый с начала."""
+        self.flush()
+        self.stream.write(self.tail)
+        self.stream.seek(0)
+        return self.stream
@@ -0,0 +1,159 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+
+# Запись интервалов включается enable(); в выключенном состоянии span()
+# возвращает общий пустой контекстный менеджер и ничего не записывает.
+ENABLED = False
+SPANS = []
+PROFILER = None
+STARTED = time.perf_counter()
+
+NULL_SPAN = nullcontext()
+LOCK = threading.Lock()
+
+class Span:
+    """Интервал выполнения: этап программы, запрос к базе или генерация документа."""
+
+    __slots__ = ("kind", "name", "attrs", "start")
+
+    def __init__(self, kind, name, attrs):
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = repr(exc)
+        add_record(self.kind, self.name, self.start, time.perf_counter() - self.start, self.attrs)
+        return False
+
+def add_record(kind, name, start, duration, attrs):
+    entry = {
+        "kind": kind,
+        "name": name,
+        "start": start - STARTED,
+        "duration": duration,
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+    }
+    if tracemalloc.is_tracing():
+        entry["memory_kb"] = tracemalloc.get_traced_memory()[0] // 1024
+    entry.update(attrs)
+    with LOCK:
+        SPANS.append(entry)
+
+def record(kind, name, start, duration, **attrs):
+    """Запись интервала, длительность которого измерена вызывающим кодом
+    (например, суммарное время чтения строк потокового запроса)."""
+    if ENABLED:
+        add_record(kind, name, start, duration, attrs)
+
+def span(kind, name, **attrs):
+    """Контекстный менеджер интервала; attrs попадают в запись трассировки.
+
+    Внутри блока атрибуты можно дополнить через s.attrs (например, число
+    строк запроса), предварительно проверив, что s не None.
+    """
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(kind, name, attrs)
+
+def traced(kind):
+    """Декоратор: выполнение функции записывается как интервал kind."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with Span(kind, func.__name__, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def enable(profile=False, memory=False):
+    """Включение трассировки и, при необходимости, cProfile и tracemalloc."""
+    global ENABLED, PROFILER, STARTED
+    ENABLED = True
+    STARTED = time.perf_counter()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if profile:
+        PROFILER = cProfile.Profile()
+        PROFILER.enable()
+
+def call_traced(started, func, *args):
+    """Вызов func в процессе пула с трассировкой; возвращает (результат, интервалы).
+
+    started - значение STARTED родительского процесса, чтобы время начала
+    интервалов отсчитывалось от общего момента. Интервалы дочернего
+    процесса передаются родителю через merge().
+    """
+    global ENABLED, STARTED
+    ENABLED = True
+    STARTED = started
+    del SPANS[:]
+    result = func(*args)
+    return result, list(SPANS)
+
+def merge(spans):
+    """Добавление интервалов, полученных из другого процесса."""
+    with LOCK:
+        SPANS.extend(spans)
+
+def write_trace(path):
+    """Запись трассировки в формате JSON Lines (одна запись на строку)."""
+    with open(path, "w", encoding="utf-8") as f:
+        for record in sorted(SPANS, key=lambda record: record["start"]):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def git_revision():
+    """Короткий хэш текущей ревизии git (None вне репозитория) для файлов замеров."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summary(profile_path=None, top=20):
+    """Текстовая сводка: время по этапам, запросам и документам."""
+    groups = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0, "rows": 0})
+    for record in SPANS:
+        group = groups[(record["kind"], record["name"])]
+        group["count"] += 1
+        group["total"] += record["duration"]
+        group["max"] = max(group["max"], record["duration"])
+        group["rows"] += record.get("rows", 0)
+
+    lines = [f"{'тип':8} {'имя':40} {'вызовов':>8} {'всего, с':>10} {'макс, с':>10} {'строк':>8}"]
+    for (kind, name), group in sorted(groups.items(), key=lambda item: -item[1]["total"]):
+        lines.append(f"{kind:8} {name:40} {group['count']:>8} {group['total']:>10.3f} "
+                     f"{group['max']:>10.3f} {group['rows']:>8}")
+    lines.append(f"Общее время: {time.perf_counter() - STARTED:.3f} с")
+
+    if tracemalloc.is_tracing():
+        lines.append(f"Пик памяти (tracemalloc): {tracemalloc.get_traced_memory()[1] // 1024} КБ")
+
+    if PROFILER is not None:
+        PROFILER.disable()
+        if profile_path:
+            PROFILER.dump_stats(profile_path)
+            lines.append(f"Профиль cProfile сохранен в {profile_path}")
+        stream = io.StringIO()
+        pstats.Stats(PROFILER, stream=stream).sort_stats("cumulative").print_stats(top)
+        lines.append(stream.getvalue())
+    return "\n".join(lines)
@@ -1,7 +1,15 @@
+import argparse
 import database
 import doc_generator
-import json
+import instrumentation
 import os
+import re
+import sqlite_snapshot
+import time
+import watch
+from collections import deque
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
 
 def select_conference(conferences):
     """Выбор конференции из списка."""
@@ -28,36 +36,428 @@ def select_conference(conferences):
         except ValueError:
             print("Пожалуйста, введите корректный номер.")
 
+def conference_output_dir(conference, root=""):
+    """Имя папки для документов конференции.
+
+    Недопустимые в именах файлов символы заменяются на '_', а к названию
+    добавляется id мероприятия, чтобы конференции с одинаковыми названиями
+    (и параллельные генерации) не перезаписывали документы друг друга.
+    """
+    title = doc_generator.safe_filename(conference.title)[:100]
+    return os.path.join(root, f"{title or 'conference'}_{conference.id}")
+
+def title_pattern(value):
+    """Тип аргумента --title: регулярное выражение без учета регистра."""
+    try:
+        return re.compile(value, re.IGNORECASE)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"неверное регулярное выражение '{value}': {e}")
+
+def iso_date(value):
+    """Тип аргументов --date-from/--date-to: дата YYYY-MM-DD."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверная дата '{value}', ожидается YYYY-MM-DD")
+
+def positive_int(value):
+    """Тип аргументов --workers/--concurrency: целое число не меньше 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число, получено '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"ожидается число не меньше 1, получено {number}")
+    return number
+
+def filter_conferences(conferences, event_ids=None, date_from=None, date_to=None, title_re=None):
+    """Отбор конференций каталога по id, диапазону дат начала (datetime.date)
+    и регулярному выражению для названия."""
+    selected = []
+    for conf in conferences:
+        if event_ids and conf["id"] not in event_ids:
+            continue
+        if date_from or date_to:
+            start_dt = conf.get("start_dt")
+            if not start_dt:
+                continue
+            start = datetime.fromisoformat(start_dt).date()
+            if date_from and start < date_from:
+                continue
+            if date_to and start > date_to:
+                continue
+        if title_re and not title_re.search(conf["title"]):
+            continue
+        selected.append(conf)
+    return selected
+
+def render_conference(conference, output_dir, use_cache=True):
+    """Генерация документов одной конференции в пакетном режиме.
+
+    Выполняется в процессе пула; возвращает пару (время в секундах, текст
+    ошибки или None).
+    """
+    start = time.perf_counter()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        doc_generator.create_conference_docx(conference, output_dir, mode=None, use_cache=use_cache)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return time.perf_counter() - start, error
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Генерация документов конференции из базы данных Indico.")
+    parser.add_argument(
+        "--refresh", metavar="SNAPSHOT",
+        help="инкрементально обновить снимок конференций (JSON Lines + индекс .idx или база SQLite "
+             "для файлов .sqlite, .sqlite3, .db) и завершить работу"
+    )
+    parser.add_argument(
+        "--export", metavar="SNAPSHOT",
+        help="создать снимок заново из базы данных (всех конференций или только --event-id) "
+             "и завершить работу"
+    )
+    parser.add_argument(
+        "--snapshot", metavar="SNAPSHOT",
+        help="брать данные из ранее созданного снимка, а не из базы данных"
+    )
+    parser.add_argument(
+        "--accepted", action="store_true",
+        help="вывести принятые доклады всех конференций снимка SQLite (--snapshot), начавшихся "
+             "в диапазоне --date-from/--date-to, и завершить работу"
+    )
+    parser.add_argument(
+        "--create-indexes", action="store_true",
+        help="создать в базе индексы для запросов извлечения (database.INDEXES) и завершить работу"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="пересоздать все документы, даже если их входные данные не изменились"
+    )
+    parser.add_argument(
+        "--workers", type=positive_int, default=1,
+        help="число потоков (и соединений с базой) для извлечения данных"
+    )
+
+    profiling = parser.add_argument_group("профилирование")
+    profiling.add_argument("--profile", action="store_true",
+                           help="записать трассировку этапов и запросов и вывести сводку по времени")
+    profiling.add_argument("--trace-file", default="trace.jsonl",
+                           help="файл трассировки в формате JSON Lines (по умолчанию trace.jsonl)")
+    profiling.add_argument("--cprofile", metavar="PSTATS",
+                           help="дополнительно профилировать cProfile и сохранить статистику в файл")
+    profiling.add_argument("--tracemalloc", action="store_true",
+                           help="дополнительно отслеживать выделение памяти через tracemalloc")
+
+    batch = parser.add_argument_group("пакетный режим")
+    batch.add_argument(
+        "--batch", action="store_true",
+        help="без диалога сгенерировать документы для всех конференций, прошедших фильтры"
+    )
+    batch.add_argument("--event-id", type=int, action="append", dest="event_ids", metavar="ID",
+                       help="id мероприятия (можно указать несколько раз)")
+    batch.add_argument("--date-from", type=iso_date, metavar="YYYY-MM-DD",
+                       help="начало конференции не раньше даты")
+    batch.add_argument("--date-to", type=iso_date, metavar="YYYY-MM-DD",
+                       help="начало конференции не позже даты")
+    batch.add_argument("--title", type=title_pattern, metavar="REGEX",
+                       help="регулярное выражение для названия конференции")
+    batch.add_argument("--concurrency", type=positive_int, default=os.cpu_count() or 1,
+                       help="число конференций, генерируемых одновременно")
+    batch.add_argument("--output-root", default=".", help="папка, в которой создаются папки конференций")
+    batch.add_argument("--pipeline", action="store_true",
+                       help="извлекать данные в отдельном потоке одновременно с генерацией документов")
+
+    watching = parser.add_argument_group("слежение за изменениями")
+    watching.add_argument("--watch", action="store_true",
+                          help="следить за изменениями в базе и пересоздавать документы затронутых "
+                               "конференций в папках внутри --output-root")
+    watching.add_argument("--install-triggers", action="store_true",
+                          help="установить в базе триггеры уведомлений для --watch и завершить работу")
+    watching.add_argument("--remove-triggers", action="store_true",
+                          help="удалить триггеры уведомлений и завершить работу")
+    watching.add_argument("--poll", action="store_true",
+                          help="опрашивать отпечатки мероприятий, даже если триггеры установлены")
+    watching.add_argument("--poll-interval", type=float, default=30.0,
+                          help="период опроса отпечатков, с (по умолчанию 30)")
+    watching.add_argument("--debounce", type=float, default=2.0,
+                          help="пауза без изменений перед пересозданием документов, с (по умолчанию 2)")
+    watching.add_argument("--max-delay", type=float, default=30.0,
+                          help="наибольшая задержка пересоздания при непрерывных изменениях, с")
+    return parser.parse_args()
+
+def snapshot_store(path):
+    """Модуль снимка по имени файла: SQLite (sqlite_snapshot) или JSON Lines (database)."""
+    return sqlite_snapshot if sqlite_snapshot.is_sqlite_path(path) else database
+
+def refresh_snapshot(json_file_path, workers=1):
+    """Инкрементальное обновление снимка конференций (для ночного запуска)."""
+    print(f"Обновление снимка {json_file_path}...")
+    try:
+        with instrumentation.span("stage", "refresh"):
+            changed, removed = snapshot_store(json_file_path).update_conference_json(json_file_path, workers)
+    except Exception as e:
+        print(f"Ошибка при обновлении снимка: {e}")
+        return
+    print(f"Снимок обновлен: изменено {len(changed)}, удалено {len(removed)} конференций.")
+
+def export_snapshot(path, event_ids=None, workers=1):
+    """Создание снимка конференций заново (JSON Lines или SQLite по имени файла)."""
+    print(f"Создание снимка {path}...")
+    try:
+        with instrumentation.span("stage", "export"):
+            snapshot_store(path).create_conference_json(path, event_ids, workers)
+    except Exception as e:
+        print(f"Ошибка при создании снимка: {e}")
+        return
+    print(f"Снимок создан: {path}")
+
+def print_accepted(args):
+    """Принятые доклады всех конференций снимка SQLite в диапазоне дат."""
+    if not args.snapshot or not sqlite_snapshot.is_sqlite_path(args.snapshot):
+        print("Ошибка: для --accepted нужен снимок SQLite (--snapshot с расширением "
+              f"{', '.join(sqlite_snapshot.SQLITE_EXTENSIONS)}).")
+        return
+    try:
+        with instrumentation.span("stage", "accepted"):
+            contributions = sqlite_snapshot.accepted_contributions(args.snapshot, args.date_from, args.date_to)
+    except Exception as e:
+        print(f"Ошибка при чтении снимка: {e}")
+        return
+    event_id = None
+    for contribution in contributions:
+        if contribution["event_id"] != event_id:
+            event_id = contribution["event_id"]
+            print(contribution["event_title"])
+        speaker = f"{contribution['last_name']} {contribution['first_name']}"
+        if contribution["affiliation"]:
+            speaker += f" ({contribution['affiliation']})"
+        print(f"- заседание {contribution['session_number']}: {speaker} - {contribution['title']}")
+    print(f"Принятых докладов: {len(contributions)}")
+
+def create_indexes():
+    """Создание индексов для запросов извлечения."""
+    print("Создание индексов...")
+    conn = None
+    try:
+        conn = database.connect()
+        with instrumentation.span("stage", "create_indexes"):
+            database.create_indexes(conn)
+    except Exception as e:
+        print(f"Ошибка при создании индексов: {e}")
+        return
+    finally:
+        if conn:
+            conn.close()
+    print(f"Индексы созданы: {len(database.INDEXES)}.")
+
+def setup_triggers(remove=False):
+    """Установка или удаление триггеров уведомлений для режима слежения."""
+    conn = None
+    try:
+        conn = database.connect()
+        if remove:
+            database.remove_triggers(conn)
+        else:
+            database.install_triggers(conn)
+    except Exception as e:
+        print(f"Ошибка при настройке триггеров: {e}")
+        return
+    finally:
+        if conn:
+            conn.close()
+    print("Триггеры удалены." if remove else f"Триггеры установлены на {len(database.NOTIFY_TABLES)} таблиц.")
+
+def run_watch(args):
+    """Пересоздание документов конференций при изменении их данных в базе."""
+    listen_conn = conn = None
+    try:
+        listen_conn = database.connect()
+        conn = database.connect()
+        if not args.poll and database.triggers_installed(conn):
+            print(f"Ожидание уведомлений канала {database.NOTIFY_CHANNEL}...")
+            poll = watch.notification_source(listen_conn)
+        else:
+            print(f"Триггеры не используются, опрос отпечатков каждые {args.poll_interval:g} с...")
+            poll = watch.fingerprint_source(listen_conn, args.poll_interval)
+
+        for batch in watch.iter_change_batches(poll, args.debounce, args.max_delay):
+            try:
+                with instrumentation.span("stage", "watch_batch", events=len(batch)):
+                    conferences = database.fetch_conferences(conn, sorted(batch))
+                    conn.rollback()
+                    for conference in conferences:
+                        output_dir = conference_output_dir(conference, args.output_root)
+                        os.makedirs(output_dir, exist_ok=True)
+                        rendered = doc_generator.create_conference_docx(
+                            conference, output_dir, mode=None, use_cache=not args.force,
+                            kinds=batch[conference.id]
+                        )
+                        print(f"- {output_dir}: " + (", ".join(rendered) if rendered else "без изменений"))
+            except Exception as e:
+                conn.rollback()
+                print(f"Ошибка при пересоздании документов: {e}")
+    except KeyboardInterrupt:
+        print("Слежение остановлено.")
+    except Exception as e:
+        print(f"Ошибка в режиме слежения: {e}")
+    finally:
+        for connection in (listen_conn, conn):
+            if connection:
+                connection.close()
+
+def run_batch(args):
+    """Пакетная генерация документов для отфильтрованных конференций."""
+    started = time.perf_counter()
+    try:
+        with instrumentation.span("stage", "catalog"):
+            if args.snapshot:
+                catalog = snapshot_store(args.snapshot).read_snapshot_index(args.snapshot)
+            else:
+                catalog = database.fetch_catalog()
+    except Exception as e:
+        print(f"Ошибка при извлечении списка конференций: {e}")
+        return
+
+    selected = filter_conferences(catalog, args.event_ids, args.date_from, args.date_to, args.title)
+    print(f"Выбрано конференций: {len(selected)} из {len(catalog)}")
+    if not selected:
+        return
+    ids = [conf["id"] for conf in selected]
+
+    results = []
+    conn = None
+    conferences = None
+    try:
+        if args.snapshot:
+            conferences = snapshot_store(args.snapshot).iter_snapshot_conferences(args.snapshot, ids)
+        else:
+            conn = database.connect()
+            conferences = database.extract_conferences(conn, ids, args.workers)
+        if args.pipeline:
+            # Извлечение идет в фоновом потоке и опережает генерацию не
+            # больше чем на 2 * concurrency конференций
+            conferences = database.prefetch(conferences, 2 * args.concurrency)
+
+        def collect(title, output_dir, future):
+            result = future.result()
+            if instrumentation.ENABLED:
+                result, spans = result
+                instrumentation.merge(spans)
+            results.append((title, output_dir, *result))
+
+        with instrumentation.span("stage", "batch"), ProcessPoolExecutor(max_workers=args.concurrency) as executor:
+            # Конференции отправляются в пул по мере извлечения; в очереди
+            # держится не больше 2 * concurrency конференций.
+            pending = deque()
+            for conference in conferences:
+                output_dir = conference_output_dir(conference, args.output_root)
+                task = (render_conference, conference, output_dir, not args.force)
+                if instrumentation.ENABLED:
+                    future = executor.submit(instrumentation.call_traced, instrumentation.STARTED, *task)
+                else:
+                    future = executor.submit(*task)
+                pending.append((conference.title, output_dir, future))
+                if len(pending) >= 2 * args.concurrency:
+                    collect(*pending.popleft())
+            while pending:
+                collect(*pending.popleft())
+    except Exception as e:
+        print(f"Ошибка при извлечении данных конференций: {e}")
+    finally:
+        if conferences is not None and hasattr(conferences, "close"):
+            conferences.close()
+        if conn:
+            conn.close()
+
+    print("Итоги пакетной генерации:")
+    failures = 0
+    for title, output_dir, elapsed, error in results:
+        if error:
+            failures += 1
+            print(f"- ОШИБКА {title} ({elapsed:.2f} с): {error}")
+        else:
+            print(f"- {output_dir} ({elapsed:.2f} с)")
+    print(f"Успешно: {len(results) - failures}, с ошибками: {failures}, "
+          f"не обработано: {len(selected) - len(results)}, "
+          f"общее время: {time.perf_counter() - started:.2f} с")
+
+def report_profile(args):
+    """Запись трассировки и вывод сводки по времени этапов."""
+    try:
+        instrumentation.write_trace(args.trace_file)
+        print(f"Трассировка сохранена в {args.trace_file}")
+    except Exception as e:
+        print(f"Ошибка при записи трассировки: {e}")
+    print(instrumentation.summary(args.cprofile))
+
 def main():
-    json_file_path = "conference_data.json"
-    
+    args = parse_args()
+    if args.profile or args.cprofile or args.tracemalloc:
+        instrumentation.enable(profile=bool(args.cprofile), memory=args.tracemalloc)
+
+    try:
+        if args.create_indexes:
+            create_indexes()
+        elif args.install_triggers or args.remove_triggers:
+            setup_triggers(remove=args.remove_triggers)
+        elif args.watch:
+            run_watch(args)
+        elif args.refresh:
+            refresh_snapshot(args.refresh, args.workers)
+        elif args.export:
+            export_snapshot(args.export, args.event_ids, args.workers)
+        elif args.accepted:
+            print_accepted(args)
+        elif args.batch:
+            run_batch(args)
+        else:
+            run_interactive(args)
+    finally:
+        if instrumentation.ENABLED:
+            report_profile(args)
+
+def run_interactive(args):
+    """Выбор конференции в диалоге и генерация ее документов."""
     print("Запуск программы генерации документов конференции...")
     
-    # Этап 1: Извлечение данных из базы и создание JSON
-    print("Извлечение данных из базы данных...")
+    # Этап 1: Извлечение списка конференций из базы или индекса снимка
+    print("Извлечение списка конференций...")
     try:
-        database.create_conference_json(json_file_path)
-        print(f"JSON файл успешно создан: {json_file_path}")
+        with instrumentation.span("stage", "catalog"):
+            if args.snapshot:
+                conferences = snapshot_store(args.snapshot).read_snapshot_index(args.snapshot)
+            else:
+                conferences = database.fetch_catalog()
     except Exception as e:
-        print(f"Ошибка при создании JSON файла: {e}")
+        print(f"Ошибка при извлечении списка конференций: {e}")
         return
 
-    # Этап 2: Чтение JSON и выбор конференции
+    selected = select_conference(conferences)
+    if not selected:
+        return
+
+    # Этап 2: Извлечение данных только выбранной конференции
+    print(f"Извлечение данных конференции '{selected['title']}'...")
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        conferences = data["conferences"]
+        with instrumentation.span("stage", "extract"):
+            if args.snapshot:
+                selected_conference = snapshot_store(args.snapshot).load_snapshot_conference(
+                    args.snapshot, selected["id"]
+                )
+            else:
+                selected_conference = database.fetch_conference(selected["id"])
     except Exception as e:
-        print(f"Ошибка при чтении JSON файла: {e}")
+        print(f"Ошибка при извлечении данных конференции: {e}")
         return
-
-    selected_conference = select_conference(conferences)
     if not selected_conference:
+        print("Ошибка: выбранная конференция не найдена.")
         return
 
     # Этап 3: Создание папки для конференции
-    conference_title = selected_conference["title"]
-    output_dir = conference_title
+    conference_title = selected_conference.title
+    output_dir = conference_output_dir(selected_conference)
     try:
         os.makedirs(output_dir, exist_ok=True)
         print(f"Создана папка для документов: {output_dir}")
@@ -68,11 +468,15 @@ def main():
     # Этап 4: Генерация DOCX документов
     print(f"Генерация DOCX документов для конференции '{conference_title}'...")
     try:
-        doc_generator.create_conference_docx(selected_conference, output_dir)
+        with instrumentation.span("stage", "render"):
+            rendered = doc_generator.create_conference_docx(
+                selected_conference, output_dir, use_cache=not args.force
+            )
         print("Документы успешно созданы:")
-        print(f"- {output_dir}/1_Программа_к43.docx")
-        print(f"- {output_dir}/2_Отчет о проведении {conference_title}.docx")
-        print(f"- {output_dir}/3_Список представляемых к публикации докладов.docx")
+        for _, _, filename in doc_generator.DOCUMENTS:
+            name = filename(selected_conference)
+            suffix = "" if name in rendered else " (без изменений)"
+            print(f"- {output_dir}/{name}{suffix}")
     except Exception as e:
         print(f"Ошибка при создании DOCX документов: {e}")
         return
@@ -0,0 +1,181 @@
+import sys
+from dataclasses import dataclass, field
+
+# Модель данных конференции. Объекты со __slots__ заметно компактнее
+# вложенных словарей, а повторяющиеся строки (места работы, состояния
+# рецензирования, роли, аудитории, даты) интернируются и хранятся в одном
+# экземпляре. Формат словарей (to_dict/from_dict) совпадает с форматом
+# снимка conference_data и прежнего JSON.
+
+def intern(value):
+    """Интернирование строки; None превращается в ''."""
+    return sys.intern(value) if value else ""
+
+@dataclass(slots=True)
+class Person:
+    first_name: str
+    last_name: str
+    affiliation: str = ""
+    email: str = ""
+
+    @property
+    def full_name(self):
+        """Фамилия и имя, как в документах: 'Иванов Иван Иванович'."""
+        return f"{self.last_name} {self.first_name}" if self.first_name else self.last_name
+
+    @classmethod
+    def create(cls, first_name, last_name, affiliation="", email=""):
+        return cls(first_name or "", last_name or "", intern(affiliation), email or "")
+
+    def to_speaker_dict(self):
+        return {
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "full_name": self.full_name,
+            "affiliation": self.affiliation
+        }
+
+    def to_leader_dict(self):
+        person_data = {"name": self.full_name, "affiliation": self.affiliation}
+        if self.email:
+            person_data["email"] = self.email
+        return person_data
+
+    @classmethod
+    def from_speaker_dict(cls, data):
+        return cls.create(data.get("first_name", ""), data.get("last_name", ""), data.get("affiliation", ""))
+
+    @classmethod
+    def from_leader_dict(cls, data):
+        last_name, _, first_name = data.get("name", "").partition(" ")
+        return cls.create(first_name, last_name, data.get("affiliation", ""), data.get("email", ""))
+
+@dataclass(slots=True)
+class Contribution:
+    id: int
+    title: str
+    start_time: str
+    duration: str
+    speaker: Person
+    review_state: str
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "speaker": self.speaker.to_speaker_dict(),
+            "review_state": self.review_state
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("id"),
+            data.get("title", ""),
+            intern(data.get("start_time", "")),
+            intern(data.get("duration", "")),
+            Person.from_speaker_dict(data.get("speaker", {})),
+            intern(data.get("review_state", ""))
+        )
+
+@dataclass(slots=True)
+class Session:
+    id: int
+    number: str
+    title: str
+    date: str
+    start_time: str
+    duration: str
+    room_name: str
+    contributions: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "number": self.number,
+            "title": self.title,
+            "date": self.date,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "room_name": self.room_name,
+            "contributions": [contribution.to_dict() for contribution in self.contributions]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("id"),
+            data.get("number", ""),
+            intern(data.get("title", "")),
+            intern(data.get("date", "")),
+            intern(data.get("start_time", "")),
+            intern(data.get("duration", "")),
+            intern(data.get("room_name", "")),
+            [Contribution.from_dict(contribution) for contribution in data.get("contributions", [])]
+        )
+
+@dataclass(slots=True)
+class Conference:
+    id: int
+    title: str
+    start_date: str
+    start_time: str
+    end_date: str
+    end_time: str
+    venue_name: str = ""
+    room_name: str = ""
+    address: str = ""
+    timezone: str = ""
+    start_dt: str = ""
+    end_dt: str = ""
+    sessions: list = field(default_factory=list)
+    # Роль ('scientific_leader', 'deputy_leader', 'secretary' или название
+    # роли в Indico) -> Person
+    leadership: dict = field(default_factory=dict)
+
+    def leader(self, role):
+        """Руководитель с ролью role или None."""
+        return self.leadership.get(role)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "start_date": self.start_date,
+            "start_time": self.start_time,
+            "end_date": self.end_date,
+            "end_time": self.end_time,
+            "venue_name": self.venue_name,
+            "room_name": self.room_name,
+            "address": self.address,
+            "timezone": self.timezone,
+            "start_dt": self.start_dt,
+            "end_dt": self.end_dt,
+            "sessions": [session.to_dict() for session in self.sessions],
+            "leadership": {role: person.to_leader_dict() for role, person in self.leadership.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("id"),
+            data.get("title", ""),
+            intern(data.get("start_date", "")),
+            intern(data.get("start_time", "")),
+            intern(data.get("end_date", "")),
+            intern(data.get("end_time", "")),
+            intern(data.get("venue_name", "")),
+            intern(data.get("room_name", "")),
+            intern(data.get("address", "")),
+            intern(data.get("timezone", "")),
+            data.get("start_dt", ""),
+            data.get("end_dt", ""),
+            [Session.from_dict(session) for session in data.get("sessions", [])],
+            {intern(role): Person.from_leader_dict(person) for role, person in data.get("leadership", {}).items()}
+        )
+
+def as_conference(data):
+    """Conference из объекта модели или словаря в формате снимка."""
+    return data if isinstance(data, Conference) else Conference.from_dict(data)
@@ -0,0 +1,274 @@
+"""Планы запросов извлечения и подсказки по индексам.
+
+Примеры:
+    python query_plans.py --output plans.json
+    python query_plans.py --event-id 12 --event-id 15 --rows-threshold 1000 --output plans.json
+    python query_plans.py --compare old_plans.json plans.json
+
+Каждый запрос извлечения из database выполняется под
+EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) в транзакции, которая
+затем откатывается (VERBOSE нужен ради схем таблиц в узлах плана).
+Планы сохраняются в файл вместе с ревизией и сводкой: время, блоки
+буфера и форма плана (узлы с таблицами и индексами), так что файлы
+разных запусков сравниваются через --compare.
+
+В планах отмечаются последовательные сканирования не меньше
+--rows-threshold строк и узлы, где оценка числа строк расходится с
+фактическим больше чем в --misestimate-factor раз. Для последовательных
+сканирований предлагается индекс по столбцам условия; если подходящий
+индекс уже есть в database.INDEXES, выводится он (создается командой
+main.py --create-indexes).
+"""
+import argparse
+import difflib
+import json
+import re
+from datetime import datetime
+
+import database
+import instrumentation
+
+# Запросы извлечения; параметр каждого - список id мероприятий
+EXTRACTION_QUERIES = (
+    ("events", database.EVENTS_QUERY),
+    ("roles", database.ROLES_QUERY),
+    ("sessions", database.SESSIONS_QUERY),
+    ("contributions", database.CONTRIBUTIONS_QUERY),
+    ("fingerprints", database.FINGERPRINTS_QUERY.format(event_filter="AND e.id = ANY(%s)")),
+)
+
+# Столбец слева от сравнения в условии узла: '(event_id = ANY (...))', '(t.type = 2)'
+CONDITION_COLUMN = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\)? (<>|<=|>=|=|<|>|~~|IS) ")
+# Столбец с псевдонимом в условии соединения: '(c.id = t.contribution_id)'
+JOIN_COLUMN = re.compile(r"\b(\w+)\.(\w+)\b")
+# Таблица и столбцы индекса в database.INDEXES
+INDEX_DEFINITION = re.compile(r"\bON (\S+) \(([^)]*)\)")
+
+JOIN_CONDITIONS = ("Hash Cond", "Merge Cond", "Join Filter")
+
+def explain(cur, query, params):
+    """План запроса (корень JSON плана EXPLAIN ANALYZE)."""
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {query.strip().rstrip(';')}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+def iter_nodes(node, ancestors=()):
+    """Обход узлов плана: (узел, кортеж предков от корня)."""
+    yield node, ancestors
+    for child in node.get("Plans", []):
+        yield from iter_nodes(child, ancestors + (node,))
+
+def relation(node):
+    return f"{node.get('Schema', 'public')}.{node['Relation Name']}"
+
+def node_label(node):
+    label = node["Node Type"]
+    if "Relation Name" in node:
+        label += f" on {relation(node)}"
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    return label
+
+def plan_shape(plan):
+    """Форма плана: узлы с таблицами и индексами, без оценок и времени.
+
+    Одинаковые формы в разных запусках означают одинаковую стратегию
+    выполнения; по ним сравнение находит смену плана.
+    """
+    return ["  " * len(ancestors) + node_label(node) for node, ancestors in iter_nodes(plan["Plan"])]
+
+def condition_columns(condition, alias=None):
+    """Столбцы условия: сначала сравниваемые на равенство, затем остальные.
+
+    С alias из условия соединения берутся только столбцы этой таблицы.
+    """
+    if alias is not None:
+        columns = [column for table, column in JOIN_COLUMN.findall(condition) if table == alias]
+        return list(dict.fromkeys(columns))
+    matches = CONDITION_COLUMN.findall(condition)
+    equal = [column for _, column, operator in matches if operator in ("=", "IS")]
+    other = [column for _, column, operator in matches if operator not in ("=", "IS")]
+    return list(dict.fromkeys(equal + other))
+
+def scan_columns(node, ancestors):
+    """Столбцы, по которым последовательное сканирование можно заменить индексным.
+
+    Это столбцы фильтра узла, а без фильтра - столбцы этой таблицы в
+    условии ближайшего соединения выше (Hash Join над Hash и т. п.).
+    """
+    if node.get("Filter"):
+        columns = condition_columns(node["Filter"])
+        if columns:
+            return columns
+    alias = node.get("Alias", node.get("Relation Name"))
+    for ancestor in reversed(ancestors):
+        for key in JOIN_CONDITIONS:
+            if ancestor.get(key):
+                columns = condition_columns(ancestor[key], alias)
+                # По первичному ключу id индекс уже есть: планировщик
+                # выбрал сканирование сознательно
+                if columns and columns != ["id"]:
+                    return columns
+    return []
+
+def known_indexes():
+    """Индексы database.INDEXES: список (таблица, столбцы, команда)."""
+    indexes = []
+    for statement in database.INDEXES:
+        match = INDEX_DEFINITION.search(statement)
+        if match:
+            columns = [column.split()[0] for column in match.group(2).split(",")]
+            indexes.append((match.group(1), columns, " ".join(statement.split())))
+    return indexes
+
+def suggest_index(table, columns):
+    """Команда создания индекса: из database.INDEXES, если он начинается с того же столбца."""
+    for known_table, known_columns, statement in known_indexes():
+        if known_table == table and known_columns[0] == columns[0]:
+            return statement
+    name = f"ix_docgen_{table.rsplit('.', 1)[-1]}_{'_'.join(columns)}"
+    return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+
+def analyze_plan(plan, rows_threshold, misestimate_factor):
+    """Замечания по плану: последовательные сканирования и ошибки оценки числа строк."""
+    findings = []
+    for node, ancestors in iter_nodes(plan["Plan"]):
+        loops = node.get("Actual Loops", 0)
+        if not loops:
+            continue
+        estimated = node["Plan Rows"]
+        actual = node["Actual Rows"]
+        if node["Node Type"] == "Seq Scan":
+            scanned = (actual + node.get("Rows Removed by Filter", 0)) * loops
+            if scanned >= rows_threshold:
+                columns = scan_columns(node, ancestors)
+                findings.append({
+                    "kind": "seq_scan",
+                    "node": node_label(node),
+                    "rows": scanned,
+                    "index": suggest_index(relation(node), columns) if columns else None,
+                })
+        factor = max(estimated, actual) / max(min(estimated, actual), 1)
+        if factor >= misestimate_factor and max(estimated, actual) * loops >= rows_threshold:
+            findings.append({
+                "kind": "misestimate",
+                "node": node_label(node),
+                "estimated": estimated,
+                "actual": actual,
+                "loops": loops,
+            })
+    return findings
+
+def buffers(plan):
+    node = plan["Plan"]
+    return {"shared_hit": node.get("Shared Hit Blocks", 0), "shared_read": node.get("Shared Read Blocks", 0)}
+
+def capture_plans(conn, event_ids, rows_threshold, misestimate_factor):
+    """Планы всех запросов извлечения для мероприятий event_ids (None - все)."""
+    results = {}
+    try:
+        with conn.cursor() as cur:
+            if event_ids is None:
+                cur.execute(database.EVENT_IDS_QUERY)
+                event_ids = [row[0] for row in cur.fetchall()]
+            for name, query in EXTRACTION_QUERIES:
+                plan = explain(cur, query, (event_ids,))
+                results[name] = {
+                    "execution_ms": plan.get("Execution Time"),
+                    "planning_ms": plan.get("Planning Time"),
+                    **buffers(plan),
+                    "shape": plan_shape(plan),
+                    "findings": analyze_plan(plan, rows_threshold, misestimate_factor),
+                    "plan": plan,
+                }
+    finally:
+        # EXPLAIN ANALYZE выполняет запросы; они только читают, транзакция откатывается
+        conn.rollback()
+    return results, len(event_ids)
+
+def print_findings(results):
+    suggestions = []
+    for name, result in results.items():
+        print(f"{name}: {result['execution_ms']:.1f} мс, блоков из кэша {result['shared_hit']}, "
+              f"прочитано {result['shared_read']}")
+        for finding in result["findings"]:
+            if finding["kind"] == "seq_scan":
+                print(f"    последовательное сканирование: {finding['node']}, строк {finding['rows']}")
+                if finding["index"] and finding["index"] not in suggestions:
+                    suggestions.append(finding["index"])
+            else:
+                print(f"    ошибка оценки: {finding['node']}, оценка {finding['estimated']}, "
+                      f"факт {finding['actual']} (циклов {finding['loops']})")
+    if suggestions:
+        print("Предлагаемые индексы:")
+        for statement in suggestions:
+            print(f"    {statement};")
+
+def compare(old_path, new_path):
+    """Сравнение двух файлов планов: время, блоки буфера и изменения формы планов."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old_path} ({old.get('revision')}) -> {new_path} ({new.get('revision')})")
+    for name in sorted(set(old["queries"]) | set(new["queries"])):
+        before, after = old["queries"].get(name), new["queries"].get(name)
+        if before is None or after is None:
+            print(f"{name}: есть только в {old_path if after is None else new_path}")
+            continue
+        for metric in ("execution_ms", "shared_hit", "shared_read"):
+            a, b = before[metric], after[metric]
+            ratio = f"x{b / a:.2f}" if a else ""
+            print(f"{name + '.' + metric:30} {a!s:>14} {b!s:>14} {ratio}")
+        if before["shape"] != after["shape"]:
+            print(f"{name}: план изменился")
+            for line in difflib.unified_diff(before["shape"], after["shape"], lineterm="", n=0):
+                if not line.startswith(("---", "+++", "@@")):
+                    print(f"    {line}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Планы запросов извлечения и подсказки по индексам.")
+    parser.add_argument("--event-id", type=int, action="append", dest="event_ids", metavar="ID",
+                        help="id мероприятия (можно указать несколько раз; по умолчанию все)")
+    parser.add_argument("--rows-threshold", type=int, default=1000,
+                        help="наименьшее число строк узла, о котором стоит сообщать")
+    parser.add_argument("--misestimate-factor", type=float, default=10.0,
+                        help="во сколько раз оценка числа строк должна разойтись с фактом")
+    parser.add_argument("--output", default="plans.json", help="файл для сохранения планов")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла планов")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    try:
+        conn = database.connect()
+    except Exception as e:
+        print(f"Ошибка подключения к базе данных: {e}")
+        return
+    try:
+        results, events = capture_plans(conn, args.event_ids, args.rows_threshold, args.misestimate_factor)
+    except Exception as e:
+        print(f"Ошибка при получении планов: {e}")
+        return
+    finally:
+        conn.close()
+
+    report = {"revision": instrumentation.git_revision(),
+              "created": datetime.now().isoformat(timespec="seconds"),
+              "params": {"events": events, "rows_threshold": args.rows_threshold,
+                         "misestimate_factor": args.misestimate_factor},
+              "queries": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+    print_findings(results)
+    print(f"Планы сохранены в {args.output}")
+
+if __name__ == "__main__":
+    main()
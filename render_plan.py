@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+
+from models import as_conference
+
+# План генерации документов конференции. Все производные значения
+# (нумерация докладов, разделение по состоянию рецензирования, статус и
+# номер группы, инициалы, строки руководителей) вычисляются за один проход
+# по конференции; генераторы документов и отпечатки кэша только читают план.
+
+# Доклады в этих состояниях выносятся в программе в конец заседания
+UNREGISTERED_STATES = ('not submitted', 'rejected')
+
+@dataclass(frozen=True, slots=True)
+class Leader:
+    name: str = ""
+    affiliation: str = ""
+    email: str = ""
+
+@dataclass(frozen=True, slots=True)
+class ProgramEntry:
+    heading: str        # '1. Иванов Иван Иванович, Студент гр. 4331'
+    title: str
+
+@dataclass(frozen=True, slots=True)
+class SessionPlan:
+    number: str
+    date: str
+    start_time: str
+    room_name: str
+    program: tuple          # ProgramEntry докладов по расписанию
+    unregistered: tuple     # ProgramEntry незарегистрированных, нумерация продолжается
+    report_rows: tuple      # строки таблицы отчета: (№, докладчик и название, статус, решение)
+
+@dataclass(frozen=True, slots=True)
+class RenderPlan:
+    title: str
+    address: str
+    scientific_leader: Leader
+    deputy_leader: Leader
+    secretary: Leader
+    # Строки 'Научный руководитель секции – ...' и 'Секретарь – ...' отчета
+    # ('' если руководителя нет)
+    report_leader_line: str
+    report_secretary_line: str
+    sessions: tuple
+    publications: tuple     # строки списка к публикации: '1. Иванов И. И.. Название'
+    contribution_count: int
+
+def leader(conference, role):
+    person = conference.leader(role)
+    if person is None:
+        return Leader()
+    return Leader(person.full_name, person.affiliation, person.email)
+
+def report_line(label, person):
+    if not (person.name or person.affiliation):
+        return ""
+    return f'{label} – {person.affiliation} {person.name}'.strip()
+
+def short_name(speaker):
+    """'Фамилия И. О.' из имени и отчества докладчика."""
+    parts = speaker.first_name.split()
+    if len(parts) > 1:
+        initials = f'{parts[0][0]}. {parts[1][0]}.'
+    elif parts:
+        initials = f'{parts[0][0]}.'
+    else:
+        initials = ''
+    return f'{speaker.last_name} {initials}'.strip()
+
+def student_status(affiliation):
+    """'Магистрант М431' или 'Студент 4331' по месту работы докладчика."""
+    status = 'Магистрант' if 'Магистрант' in affiliation else 'Студент'
+    group = affiliation.split("гр.")[1].strip() if "гр." in affiliation else ""
+    return f'{status} {group}'
+
+def build_render_plan(conference):
+    """План генерации документов: один проход по заседаниям и докладам."""
+    sessions = []
+    publications = []
+    count = 0
+    for session in conference.sessions:
+        scheduled = []
+        unregistered = []
+        report_rows = []
+        for position, contribution in enumerate(session.contributions, 1):
+            speaker = contribution.speaker
+            full_name = speaker.full_name
+            affiliation = speaker.affiliation
+            if contribution.review_state in UNREGISTERED_STATES:
+                unregistered.append((full_name, affiliation, contribution.title))
+            else:
+                scheduled.append((full_name, affiliation, contribution.title))
+            report_rows.append((
+                str(position),
+                f'{full_name}. {contribution.title}',
+                student_status(affiliation),
+                ''
+            ))
+            if contribution.review_state == 'accepted':
+                publications.append(
+                    f'{len(publications) + 1}. {short_name(speaker)}. {contribution.title}'
+                )
+        count += len(session.contributions)
+        program = tuple(
+            ProgramEntry(f'{number}. {full_name}, {affiliation}', title)
+            for number, (full_name, affiliation, title) in enumerate(scheduled + unregistered, 1)
+        )
+        sessions.append(SessionPlan(
+            session.number,
+            session.date,
+            session.start_time,
+            session.room_name,
+            program[:len(scheduled)],
+            program[len(scheduled):],
+            tuple(report_rows)
+        ))
+
+    scientific_leader = leader(conference, "scientific_leader")
+    secretary = leader(conference, "secretary")
+    return RenderPlan(
+        conference.title,
+        conference.address,
+        scientific_leader,
+        leader(conference, "deputy_leader"),
+        secretary,
+        report_line('Научный руководитель секции', scientific_leader),
+        report_line('Секретарь', secretary),
+        tuple(sessions),
+        tuple(publications),
+        count
+    )
+
+def as_render_plan(data):
+    """RenderPlan из готового плана, models.Conference или словаря снимка."""
+    if isinstance(data, RenderPlan):
+        return data
+    return build_render_plan(as_conference(data))
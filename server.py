@@ -0,0 +1,209 @@
+"""Локальный HTTP сервис генерации документов конференций.
+
+Пример:
+    python server.py --port 8043 --pool-size 4 --cache-mb 64
+
+    GET /conferences                                  - список конференций (JSON)
+    GET /conferences/{id}/program.docx                - программа
+    GET /conferences/{id}/report.docx                 - отчет
+    GET /conferences/{id}/publications.docx           - список докладов для публикации
+
+Процесс держит открытый пул соединений с базой и заранее подготовленные
+шаблоны документов. Готовые документы хранятся в памяти в LRU кэше
+ограниченного размера вместе с отпечатком данных мероприятия
+(database.FINGERPRINTS_QUERY). На каждый запрос документа отпечаток
+пересчитывается одним коротким запросом; если он не изменился, документ
+отдается из кэша без извлечения и генерации.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+import database
+import doc_generator
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+DOCUMENT_PATH = re.compile(r"^/conferences/(\d+)/(program|report|publications)\.docx$")
+
+class RenderCache:
+    """LRU кэш готовых документов, ограниченный суммарным размером в байтах.
+
+    Ключ - (id мероприятия, вид документа), значение - (отпечаток данных,
+    имя файла, содержимое). Запись с устаревшим отпечатком считается
+    промахом и заменяется при следующем put.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, fingerprint):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, fingerprint, filename, content):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[2])
+            if len(content) > self.max_bytes:
+                return
+            self.entries[key] = (fingerprint, filename, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+class BlockingPool:
+    """Пул соединений, в котором getconn ждет освобождения соединения.
+
+    ThreadingHTTPServer запускает поток на каждый запрос, а
+    ThreadedConnectionPool при занятых соединениях не ждет, а бросает
+    PoolError. Семафор на size соединений ставит лишние запросы в очередь.
+    """
+
+    def __init__(self, pool, size):
+        self.pool = pool
+        self.slots = threading.BoundedSemaphore(size)
+
+    def getconn(self):
+        self.slots.acquire()
+        try:
+            return self.pool.getconn()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            self.pool.putconn(conn)
+        finally:
+            self.slots.release()
+
+    def closeall(self):
+        self.pool.closeall()
+
+def warm_templates():
+    """Подготовка шаблонов документов до первого запроса."""
+    for font_size in (10, 14):
+        doc_generator.new_document(font_size)
+
+def render_document(conference, kind):
+    """Генерация одного документа; возвращает (имя файла, содержимое).
+
+    Документ строится во временной папке, поэтому без кэша фрагментов
+    заседаний: повторно использовать фрагменты некому.
+    """
+    generator, _, filename = doc_generator.DOCUMENT_KINDS[kind]
+    name = filename(conference)
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator(conference, output_dir, fragments=False)
+        with open(os.path.join(output_dir, name), "rb") as f:
+            return name, f.read()
+
+def get_document(pool, cache, event_id, kind):
+    """Документ kind мероприятия event_id из кэша или после генерации.
+
+    Возвращает (имя файла, содержимое, попадание в кэш) или None, если
+    мероприятия нет.
+    """
+    with database.pooled_connection(pool) as conn:
+        with conn.cursor() as cur:
+            fingerprint = database.fetch_fingerprints(cur, [event_id]).get(str(event_id))
+        if fingerprint is None:
+            return None
+        cached = cache.get((event_id, kind), fingerprint)
+        if cached is not None:
+            return (*cached, True)
+        conference = database.fetch_conference(event_id, conn)
+    if conference is None:
+        return None
+    name, content = render_document(conference, kind)
+    cache.put((event_id, kind), fingerprint, name, content)
+    return name, content, False
+
+class DocumentRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов; пул соединений и кэш задаются в сервере."""
+
+    def do_GET(self):
+        try:
+            if self.path == "/conferences":
+                with database.pooled_connection(self.server.pool) as conn:
+                    catalog = database.fetch_catalog(conn)
+                self.send_body(200, "application/json; charset=utf-8",
+                               json.dumps(catalog, ensure_ascii=False).encode("utf-8"))
+                return
+
+            match = DOCUMENT_PATH.match(self.path)
+            if not match:
+                self.send_error(404, explain="Неизвестный адрес")
+                return
+            result = get_document(self.server.pool, self.server.cache, int(match.group(1)), match.group(2))
+            if result is None:
+                self.send_error(404, explain="Конференция не найдена")
+                return
+            name, content, hit = result
+            self.send_body(200, DOCX_CONTENT_TYPE, content, {
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}",
+                "X-Cache": "hit" if hit else "miss",
+            })
+        except Exception as e:
+            self.send_error(500, explain=str(e))
+
+    def send_body(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def create_server(host, port, pool_size, cache_bytes):
+    """HTTP сервер с пулом соединений и кэшем документов."""
+    server = ThreadingHTTPServer((host, port), DocumentRequestHandler)
+    server.daemon_threads = True
+    server.pool = BlockingPool(database.create_pool(pool_size), pool_size)
+    server.cache = RenderCache(cache_bytes)
+    warm_templates()
+    return server
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP сервис генерации документов конференций.")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес для входящих соединений")
+    parser.add_argument("--port", type=int, default=8043, help="порт")
+    parser.add_argument("--pool-size", type=int, default=4, help="наибольшее число соединений с базой")
+    parser.add_argument("--cache-mb", type=int, default=64, help="размер кэша готовых документов, МБ")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        server = create_server(args.host, args.port, args.pool_size, args.cache_mb * 1024 * 1024)
+    except Exception as e:
+        print(f"Ошибка при запуске сервиса: {e}")
+        return
+    print(f"Сервис запущен: http://{args.host}:{args.port}/conferences")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.closeall()
+
+if __name__ == "__main__":
+    main()
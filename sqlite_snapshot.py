@@ -0,0 +1,238 @@
+"""Снимок конференций в локальной базе SQLite.
+
+Альтернатива снимку JSON Lines (database.write_snapshot): мероприятия,
+руководители, заседания и доклады хранятся в отдельных таблицах с
+индексами по event_id, id заседания и состоянию рецензирования, так что
+одна конференция или выборка по нескольким конференциям читается
+индексными запросами без разбора всего снимка. Файл можно открыть и
+обычным клиентом sqlite3 для собственных запросов.
+
+Функции повторяют интерфейс снимка в database (read_snapshot_index,
+load_snapshot_conference, iter_snapshot_conferences,
+create_conference_json, update_conference_json); main.py выбирает этот
+модуль по расширению файла снимка (.sqlite, .sqlite3, .db). Чтение идет
+через соединение только для чтения, поэтому снимок можно читать и с
+носителя или из папки без права записи.
+"""
+import os
+import sqlite3
+from contextlib import closing
+from urllib.parse import quote
+
+import database
+import instrumentation
+from models import Conference, Contribution, Person, Session, intern
+
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        start_date TEXT, start_time TEXT, end_date TEXT, end_time TEXT,
+        venue_name TEXT, room_name TEXT, address TEXT, timezone TEXT,
+        start_dt TEXT, end_dt TEXT,
+        fingerprint TEXT
+    );
+    CREATE TABLE IF NOT EXISTS roles (
+        event_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        first_name TEXT, last_name TEXT, affiliation TEXT, email TEXT,
+        PRIMARY KEY (event_id, position)
+    );
+    CREATE TABLE IF NOT EXISTS sessions (
+        event_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        id INTEGER,
+        number TEXT, title TEXT, date TEXT, start_time TEXT, duration TEXT, room_name TEXT,
+        PRIMARY KEY (event_id, position)
+    );
+    CREATE TABLE IF NOT EXISTS contributions (
+        event_id INTEGER NOT NULL,
+        session_position INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        session_id INTEGER,
+        id INTEGER,
+        title TEXT, start_time TEXT, duration TEXT,
+        first_name TEXT, last_name TEXT, affiliation TEXT,
+        review_state TEXT,
+        PRIMARY KEY (event_id, session_position, position)
+    );
+    CREATE INDEX IF NOT EXISTS ix_events_start_dt ON events (start_dt);
+    CREATE INDEX IF NOT EXISTS ix_sessions_id ON sessions (id);
+    CREATE INDEX IF NOT EXISTS ix_contributions_session_id ON contributions (session_id);
+    CREATE INDEX IF NOT EXISTS ix_contributions_review_state ON contributions (review_state, event_id);
+"""
+
+EVENT_COLUMNS = ("id, title, start_date, start_time, end_date, end_time, venue_name, room_name, "
+                 "address, timezone, start_dt, end_dt")
+
+def is_sqlite_path(path):
+    """Является ли path снимком SQLite (по расширению)."""
+    return path.lower().endswith(SQLITE_EXTENSIONS)
+
+def open_store(path):
+    """Соединение для записи снимка; таблицы и индексы создаются при отсутствии."""
+    store = sqlite3.connect(path)
+    store.executescript(SCHEMA)
+    return store
+
+def open_reader(path):
+    """Соединение только для чтения (mode=ro): схема не создается, файл не изменяется.
+
+    Отсутствующий файл - ошибка, а не новый пустой снимок.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Снимок не найден: {path}")
+    return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+
+def insert_conference(store, conf, fingerprint):
+    store.execute(
+        f"INSERT INTO events ({EVENT_COLUMNS}, fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (conf.id, conf.title, conf.start_date, conf.start_time, conf.end_date, conf.end_time,
+         conf.venue_name, conf.room_name, conf.address, conf.timezone, conf.start_dt, conf.end_dt,
+         fingerprint)
+    )
+    store.executemany(
+        "INSERT INTO roles VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(conf.id, position, role, person.first_name, person.last_name, person.affiliation, person.email)
+         for position, (role, person) in enumerate(conf.leadership.items())]
+    )
+    store.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(conf.id, position, session.id, session.number, session.title, session.date,
+          session.start_time, session.duration, session.room_name)
+         for position, session in enumerate(conf.sessions)]
+    )
+    store.executemany(
+        "INSERT INTO contributions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(conf.id, session_position, position, session.id, contribution.id, contribution.title,
+          contribution.start_time, contribution.duration, contribution.speaker.first_name,
+          contribution.speaker.last_name, contribution.speaker.affiliation, contribution.review_state)
+         for session_position, session in enumerate(conf.sessions)
+         for position, contribution in enumerate(session.contributions)]
+    )
+
+def delete_conferences(store, event_ids):
+    params = [(event_id,) for event_id in event_ids]
+    for table, column in (("events", "id"), ("roles", "event_id"), ("sessions", "event_id"),
+                          ("contributions", "event_id")):
+        store.executemany(f"DELETE FROM {table} WHERE {column} = ?", params)
+
+def read_conference(store, event_id):
+    """Сборка конференции индексными запросами; None, если ее нет."""
+    event = store.execute(f"SELECT {EVENT_COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
+    if event is None:
+        return None
+    conf = Conference(*event[:2], *map(intern, event[2:10]), *event[10:])
+    for role, first_name, last_name, affiliation, email in store.execute(
+            "SELECT role, first_name, last_name, affiliation, email FROM roles "
+            "WHERE event_id = ? ORDER BY position", (event_id,)):
+        conf.leadership[intern(role)] = Person.create(first_name, last_name, affiliation, email)
+    for row in store.execute(
+            "SELECT id, number, title, date, start_time, duration, room_name FROM sessions "
+            "WHERE event_id = ? ORDER BY position", (event_id,)):
+        conf.sessions.append(Session(row[0], row[1], *map(intern, row[2:])))
+    for session_position, contrib_id, title, start_time, duration, first_name, last_name, affiliation, \
+            review_state in store.execute(
+            "SELECT session_position, id, title, start_time, duration, first_name, last_name, affiliation, "
+            "review_state FROM contributions WHERE event_id = ? ORDER BY session_position, position",
+            (event_id,)):
+        conf.sessions[session_position].contributions.append(Contribution(
+            contrib_id, title, intern(start_time), intern(duration),
+            Person.create(first_name, last_name, affiliation), intern(review_state)
+        ))
+    return conf
+
+def write_snapshot(path, conferences, fingerprints):
+    """Запись нового снимка SQLite; файл заменяется атомарно."""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with closing(open_store(tmp_path)) as store:
+        with store:
+            for conf in conferences:
+                insert_conference(store, conf, fingerprints.get(str(conf.id)))
+    os.replace(tmp_path, path)
+
+@instrumentation.traced("io")
+def read_snapshot_index(path):
+    """Список конференций снимка (как индекс снимка JSON Lines)."""
+    with closing(open_reader(path)) as store:
+        return [
+            dict(zip(("id", "title", "start_date", "end_date", "start_dt", "end_dt", "fingerprint"), row))
+            for row in store.execute(
+                "SELECT id, title, start_date, end_date, start_dt, end_dt, fingerprint FROM events ORDER BY id"
+            )
+        ]
+
+@instrumentation.traced("io")
+def load_snapshot_conference(path, event_id):
+    """Загрузка одной конференции из снимка."""
+    with closing(open_reader(path)) as store:
+        return read_conference(store, event_id)
+
+def iter_snapshot_conferences(path, event_ids=None):
+    """Генератор конференций из снимка (всех или только с указанными id) в порядке id."""
+    with closing(open_reader(path)) as store:
+        if event_ids is None:
+            event_ids = [row[0] for row in store.execute("SELECT id FROM events ORDER BY id")]
+        for event_id in sorted(event_ids):
+            conf = read_conference(store, event_id)
+            if conf is not None:
+                yield conf
+
+def accepted_contributions(path, date_from=None, date_to=None):
+    """Принятые доклады всех конференций, начавшихся в диапазоне дат (datetime.date).
+
+    Возвращает словари с названием конференции, номером заседания,
+    докладчиком и названием доклада.
+    """
+    query = """
+        SELECT e.id, e.title, s.number, c.last_name, c.first_name, c.affiliation, c.title
+        FROM contributions c
+        JOIN events e ON e.id = c.event_id
+        JOIN sessions s ON s.event_id = c.event_id AND s.position = c.session_position
+        WHERE c.review_state = 'accepted' AND substr(e.start_dt, 1, 10) >= ? AND substr(e.start_dt, 1, 10) <= ?
+        ORDER BY e.start_dt, c.event_id, c.session_position, c.position
+    """
+    keys = ("event_id", "event_title", "session_number", "last_name", "first_name", "affiliation", "title")
+    params = (date_from.isoformat() if date_from else "", date_to.isoformat() if date_to else "9999")
+    with closing(open_reader(path)) as store:
+        return [dict(zip(keys, row)) for row in store.execute(query, params)]
+
+def create_conference_json(path, event_ids=None, workers=1):
+    """Создание снимка SQLite с данными конференций из базы данных."""
+    conn = database.connect()
+    try:
+        with conn.cursor() as cur:
+            fingerprints = database.fetch_fingerprints(cur, event_ids)
+        ids = [int(event_id) for event_id in fingerprints]
+        write_snapshot(path, database.extract_conferences(conn, ids, workers), fingerprints)
+    finally:
+        conn.close()
+
+def update_conference_json(path, workers=1):
+    """Инкрементальное обновление снимка SQLite на месте.
+
+    Изменившиеся и новые мероприятия (по отпечаткам) извлекаются заново и
+    заменяют свои строки, удаленные убираются; все изменения выполняются
+    одной транзакцией SQLite. Возвращает пару (обновленные id, удаленные id).
+    """
+    conn = database.connect()
+    try:
+        with closing(open_store(path)) as store:
+            old = dict(store.execute("SELECT id, fingerprint FROM events"))
+            with conn.cursor() as cur:
+                fingerprints = database.fetch_fingerprints(cur)
+            changed = [int(event_id) for event_id, fingerprint in fingerprints.items()
+                       if old.get(int(event_id)) != fingerprint]
+            removed = [event_id for event_id in old if str(event_id) not in fingerprints]
+            with store:
+                delete_conferences(store, changed + removed)
+                for conf in database.extract_conferences(conn, changed, workers):
+                    insert_conference(store, conf, fingerprints.get(str(conf.id)))
+    finally:
+        conn.close()
+    return changed, removed
@@ -0,0 +1,179 @@
+import gc
+import os
+import tempfile
+import tracemalloc
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import database
+from benchmark import synthetic_conference
+from models import Conference
+
+START = datetime(2024, 4, 10, 10, 0)
+
+class FakeCursor:
+    """Курсор, отдающий синтетические строки запросов извлечения.
+
+    Строки порождаются по мере чтения, как у серверного курсора, и только
+    для мероприятий из параметра запроса.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = iter(())
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        event_ids = params[0] if params else range(1, self.conn.events + 1)
+        self.rows = self.conn.rows(query, event_ids)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeConnection:
+    """Соединение с events мероприятиями по sessions заседаний из contributions докладов."""
+
+    def __init__(self, events, sessions=2, contributions=3):
+        self.events = events
+        self.sessions = sessions
+        self.contributions = contributions
+        self.executed = []
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def rows(self, query, event_ids):
+        if query is database.EVENT_IDS_QUERY:
+            return ((event_id,) for event_id in event_ids)
+        if query is database.EVENTS_QUERY:
+            return ((event_id, f"Конференция {event_id}", START, START, "", "52", "Адрес", "Europe/Moscow")
+                    for event_id in event_ids)
+        if query is database.ROLES_QUERY:
+            return ((event_id, "Научный руководитель секции", "Иван", "Иванов", "каф. 43", None)
+                    for event_id in event_ids)
+        if query is database.SESSIONS_QUERY:
+            return ((event_id, self.block_id(event_id, session), "Заседание", START, timedelta(hours=2), "52")
+                    for event_id in event_ids for session in range(self.sessions))
+        if query is database.CONTRIBUTIONS_QUERY:
+            return self.contribution_rows(event_ids)
+        raise AssertionError(f"неожиданный запрос: {query}")
+
+    def block_id(self, event_id, session):
+        return event_id * 1000 + session
+
+    def contribution_rows(self, event_ids):
+        for event_id in event_ids:
+            for session in range(self.sessions):
+                for index in range(self.contributions):
+                    contribution_id = (event_id * 1000 + session) * 100000 + index
+                    yield (event_id, self.block_id(event_id, session), contribution_id, "Доклад", START,
+                           timedelta(minutes=10), "Петр Петрович", "Петров", "Студент гр. 4331", 2)
+
+    def close(self):
+        pass
+
+class IterConferencesTest(unittest.TestCase):
+
+    def test_query_count_does_not_grow_with_event_count(self):
+        counts = []
+        for events in (1, 50):
+            conn = FakeConnection(events)
+            conferences = list(database.iter_conferences(conn))
+            self.assertEqual(len(conferences), events)
+            counts.append(len(conn.executed))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_contributions_are_grouped_by_event_and_session(self):
+        conn = FakeConnection(3, sessions=2, contributions=4)
+        conferences = list(database.iter_conferences(conn, [3, 1]))
+        self.assertEqual([conference.id for conference in conferences], [1, 3])
+        for conference in conferences:
+            self.assertEqual(len(conference.sessions), 2)
+            for session in conference.sessions:
+                self.assertEqual(len(session.contributions), 4)
+                self.assertTrue(all(contribution.id // 100000 == session.id
+                                    for contribution in session.contributions))
+            self.assertEqual(conference.leader("scientific_leader").full_name, "Иванов Иван")
+
+def extraction_memory(conn, keep_last=False):
+    """Пик и остаток памяти (tracemalloc) при переборе iter_conferences."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        last = None
+        for conference in database.iter_conferences(conn, itersize=2000):
+            if keep_last:
+                last = conference
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del last
+    return current, peak
+
+class ExtractionMemoryTest(unittest.TestCase):
+
+    def test_rows_of_a_large_event_are_not_materialized(self):
+        # 50 000 докладов одного мероприятия: пик памяти - сами объекты
+        # конференции, без списка строк или его копий
+        retained, peak = extraction_memory(FakeConnection(1, sessions=10, contributions=5000), keep_last=True)
+        self.assertLess(peak, 1.25 * retained)
+
+    def test_memory_does_not_grow_with_event_count(self):
+        _, few = extraction_memory(FakeConnection(10, sessions=10, contributions=100))
+        _, many = extraction_memory(FakeConnection(100, sessions=10, contributions=100))
+        self.assertLess(many, 1.25 * few)
+
+def open_paths():
+    """Пути файлов, открытых процессом (Linux, /proc/self/fd)."""
+    paths = set()
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            paths.add(os.readlink(os.path.join("/proc/self/fd", fd)))
+        except OSError:
+            pass
+    return paths
+
+class SnapshotUpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.realpath(os.path.join(self.dir.name, "snapshot.jsonl"))
+        self.conferences = [Conference.from_dict(synthetic_conference(event_id, 2, 3)) for event_id in (1, 2, 3)]
+        database.write_snapshot(self.path, self.conferences, {"1": "a", "2": "b", "3": "c"})
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "нужен /proc/self/fd")
+    def test_old_snapshot_is_closed_before_it_is_replaced(self):
+        changed = Conference.from_dict(synthetic_conference(2, 2, 3))
+        changed.title += " (изменено)"
+        replace = os.replace
+        open_at_replace = []
+
+        def checked_replace(src, dst):
+            if dst == self.path:
+                open_at_replace.append(self.path in open_paths())
+            replace(src, dst)
+
+        with mock.patch.object(database, "connect"), \
+                mock.patch.object(database, "fetch_fingerprints", return_value={"1": "a", "2": "x"}), \
+                mock.patch.object(database, "extract_conferences", return_value=iter([changed])), \
+                mock.patch("os.replace", side_effect=checked_replace):
+            self.assertEqual(database.update_conference_json(self.path), ([2], [3]))
+        self.assertEqual(open_at_replace, [False])
+        self.assertEqual([conf.title for conf in database.iter_snapshot_conferences(self.path)],
+                         [self.conferences[0].title, changed.title])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Запросы извлечения на синтетической схеме Indico в тестовой базе.
+
+Тесты выполняются, только если задана тестовая база (переменные
+INDICO_DB_*); benchmark.seed_database отказывается заполнять базу с
+настоящими данными.
+"""
+import os
+import unittest
+
+import database
+from benchmark import count_rows, seed_database
+
+DB_CONFIGURED = any(os.environ.get(name) for name in database.DB_CONFIG_ENV.values())
+
+EVENTS, SESSIONS, CONTRIBUTIONS = 3, 4, 5
+
+@unittest.skipUnless(DB_CONFIGURED, "не задана тестовая база INDICO_DB_*")
+class ExtractionRowCountTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = database.connect()
+        # Кроме основных строк в схеме есть лишние адреса руководителей,
+        # ранние ревизии, второй докладчик и соавтор каждого доклада, а у
+        # первого заседания каждого мероприятия два блока
+        seed_database(cls.conn, EVENTS, SESSIONS, CONTRIBUTIONS)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_one_row_per_role_member_session_block_and_contribution(self):
+        rows = count_rows(self.conn, list(range(1, EVENTS + 1)))
+        self.assertEqual(rows, {"roles": 3 * EVENTS, "sessions": EVENTS * SESSIONS,
+                                "contributions": EVENTS * SESSIONS * CONTRIBUTIONS})
+
+    def test_each_contribution_is_extracted_into_one_block(self):
+        conferences = list(database.iter_conferences(self.conn))
+        self.conn.rollback()
+        self.assertEqual([conference.id for conference in conferences], list(range(1, EVENTS + 1)))
+        for conference in conferences:
+            self.assertEqual([len(session.contributions) for session in conference.sessions],
+                             [CONTRIBUTIONS] * SESSIONS)
+            ids = [contribution.id for session in conference.sessions for contribution in session.contributions]
+            self.assertEqual(len(set(ids)), len(ids))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from urllib.request import urlopen
+
+import database
+import server
+
+class FakePool:
+    """Пул из size соединений, который, как ThreadedConnectionPool, не ждет
+    свободного соединения, а бросает ошибку."""
+
+    def __init__(self, size):
+        self.size = size
+        self.in_use = 0
+        self.most_in_use = 0
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        with self.lock:
+            if self.in_use >= self.size:
+                raise RuntimeError("connection pool exhausted")
+            self.in_use += 1
+            self.most_in_use = max(self.most_in_use, self.in_use)
+            return mock.Mock()
+
+    def putconn(self, conn):
+        with self.lock:
+            self.in_use -= 1
+
+    def closeall(self):
+        pass
+
+def slow_catalog(conn):
+    time.sleep(0.05)
+    return [{"id": 1, "title": "Конференция"}]
+
+class ServerPoolTest(unittest.TestCase):
+
+    def test_requests_beyond_pool_size_wait_for_a_connection(self):
+        pool_size = 2
+        fake_pool = FakePool(pool_size)
+        with mock.patch.object(database, "create_pool", return_value=fake_pool), \
+                mock.patch.object(database, "fetch_catalog", side_effect=slow_catalog):
+            httpd = server.create_server("127.0.0.1", 0, pool_size, 1024 * 1024)
+            thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = f"http://127.0.0.1:{httpd.server_address[1]}/conferences"
+
+                def fetch(_):
+                    with urlopen(url, timeout=10) as response:
+                        return response.status, json.loads(response.read())
+
+                with ThreadPoolExecutor(max_workers=4 * pool_size) as executor:
+                    results = list(executor.map(fetch, range(4 * pool_size)))
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+        self.assertEqual([status for status, _ in results], [200] * (4 * pool_size))
+        self.assertEqual(fake_pool.most_in_use, pool_size)
+        self.assertEqual(fake_pool.in_use, 0)
+
+if __name__ == "__main__":
+    unittest.main()
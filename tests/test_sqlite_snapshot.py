@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+import sqlite_snapshot
+from benchmark import synthetic_conference
+from models import Conference
+
+class SqliteSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "snapshot.sqlite")
+        # Мероприятия 1 и 2 начинаются 2024-04-02 и 2024-04-03
+        self.conferences = [Conference.from_dict(synthetic_conference(event_id, 2, 20)) for event_id in (1, 2)]
+        sqlite_snapshot.write_snapshot(self.path, self.conferences, {"1": "a", "2": "b"})
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_readers_do_not_modify_the_snapshot(self):
+        with open(self.path, "rb") as f:
+            before = f.read()
+        index = sqlite_snapshot.read_snapshot_index(self.path)
+        self.assertEqual([(entry["id"], entry["fingerprint"]) for entry in index], [(1, "a"), (2, "b")])
+        conference = sqlite_snapshot.load_snapshot_conference(self.path, 2)
+        self.assertEqual(conference.to_dict(), self.conferences[1].to_dict())
+        self.assertEqual([conf.id for conf in sqlite_snapshot.iter_snapshot_conferences(self.path, [2, 1])], [1, 2])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), before)
+
+    def test_reader_connection_is_read_only(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            sqlite_snapshot.open_reader(self.path).execute("DELETE FROM events")
+        with self.assertRaises(FileNotFoundError):
+            sqlite_snapshot.open_reader(os.path.join(self.dir.name, "missing.sqlite"))
+
+    def test_accepted_contributions_in_date_range(self):
+        accepted = [contribution.title for conf in self.conferences for session in conf.sessions
+                    for contribution in session.contributions if contribution.review_state == "accepted"]
+        rows = sqlite_snapshot.accepted_contributions(self.path)
+        self.assertTrue(accepted)
+        self.assertEqual([row["title"] for row in rows], accepted)
+        rows = sqlite_snapshot.accepted_contributions(self.path, date_from=date(2024, 4, 3))
+        self.assertEqual({row["event_id"] for row in rows}, {2})
+        self.assertEqual(sqlite_snapshot.accepted_contributions(self.path, date_to=date(2024, 4, 1)), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import unittest
+from unittest import mock
+
+import database
+import watch
+from benchmark import seed_database
+
+DB_CONFIGURED = any(os.environ.get(name) for name in database.DB_CONFIG_ENV.values())
+
+CONTRIBUTIONS = "events.contributions"
+REVISIONS = "event_paper_reviewing.revisions"
+
+class FakeClock:
+    """Время для watch.time: monotonic() и sleep() без настоящего ожидания."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class ScheduleDone(Exception):
+    """Расписание ScriptedPoll исчерпано."""
+
+class ScriptedPoll:
+    """poll(timeout), отдающий изменения (момент, [(event_id, таблица)]) по расписанию.
+
+    Ожидание не дольше timeout продвигает часы; когда расписание кончилось
+    и ждать предлагается без ограничения, перебор пачек останавливается.
+    """
+
+    def __init__(self, clock, schedule):
+        self.clock = clock
+        self.schedule = list(schedule)
+
+    def __call__(self, timeout):
+        if not self.schedule:
+            if timeout is None:
+                raise ScheduleDone
+            self.clock.now += timeout
+            return []
+        at, changes = self.schedule[0]
+        if timeout is not None and self.clock.now + timeout < at:
+            self.clock.now += timeout
+            return []
+        self.schedule.pop(0)
+        self.clock.now = max(self.clock.now, at)
+        return changes
+
+def batches(schedule, debounce, max_delay):
+    """Пачки iter_change_batches и моменты их выдачи."""
+    clock = FakeClock()
+    result = []
+    with mock.patch.object(watch, "time", clock):
+        try:
+            for batch in watch.iter_change_batches(ScriptedPoll(clock, schedule), debounce, max_delay):
+                result.append((clock.now, batch))
+        except ScheduleDone:
+            pass
+    return result
+
+class ChangeBatchesTest(unittest.TestCase):
+
+    def test_changes_are_debounced_into_one_batch(self):
+        result = batches([(0, [(1, CONTRIBUTIONS)]), (1, [(2, REVISIONS)]), (1.5, [(1, REVISIONS)]),
+                          (10, [(3, CONTRIBUTIONS)])], debounce=2, max_delay=30)
+        self.assertEqual(result, [
+            (3.5, {1: set(watch.ALL_DOCUMENTS), 2: {"program", "publications"}}),
+            (12, {3: set(watch.ALL_DOCUMENTS)}),
+        ])
+
+    def test_continuous_changes_are_flushed_after_max_delay(self):
+        schedule = [(second, [(1, CONTRIBUTIONS)]) for second in range(20)]
+        result = batches(schedule, debounce=2, max_delay=5)
+        self.assertEqual([at for at, _ in result][:3], [5, 11, 17])
+
+    def test_revision_change_selects_program_and_publications(self):
+        result = batches([(0, [(7, REVISIONS)])], debounce=1, max_delay=10)
+        self.assertEqual(result, [(1, {7: {"program", "publications"}})])
+        self.assertEqual(watch.affected_documents("users.emails"), {"publications"})
+        self.assertEqual(watch.affected_documents(None), watch.ALL_DOCUMENTS)
+
+class FingerprintSourceTest(unittest.TestCase):
+
+    def test_changed_and_new_events_are_reported_once_per_interval(self):
+        clock = FakeClock()
+        fingerprints = [{"1": "a", "2": "b"}, {"1": "a", "2": "c", "3": "d"}, {"1": "a", "2": "c", "3": "d"}]
+        with mock.patch.object(watch, "time", clock), \
+                mock.patch.object(database, "fetch_fingerprints", side_effect=fingerprints) as fetch:
+            poll = watch.fingerprint_source(mock.MagicMock(), interval=30)
+            self.assertEqual(poll(10), [])
+            self.assertEqual(fetch.call_count, 1)
+            self.assertEqual(poll(None), [(2, None), (3, None)])
+            self.assertEqual(clock.now, 30)
+            self.assertEqual(poll(None), [])
+            self.assertEqual(clock.now, 60)
+
+@unittest.skipUnless(DB_CONFIGURED, "не задана тестовая база INDICO_DB_*")
+class NotificationTriggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = database.connect()
+        self.listen_conn = database.connect()
+        seed_database(self.conn, 2, 2, 3)
+        database.install_triggers(self.conn)
+
+    def tearDown(self):
+        database.remove_triggers(self.conn)
+        self.listen_conn.close()
+        self.conn.close()
+
+    def test_revision_update_notifies_its_event(self):
+        self.assertTrue(database.triggers_installed(self.conn))
+        poll = watch.notification_source(self.listen_conn)
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "UPDATE event_paper_reviewing.revisions SET submitted_dt = submitted_dt + interval '1 day' "
+                "WHERE contribution_id = (SELECT min(r.contribution_id) FROM event_paper_reviewing.revisions r "
+                "JOIN events.contributions c ON c.id = r.contribution_id WHERE c.event_id = 2)"
+            )
+        self.conn.commit()
+        changes = poll(5)
+        self.assertEqual(changes, [(2, REVISIONS)])
+        self.assertEqual(watch.affected_documents(changes[0][1]), {"program", "publications"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Слежение за изменениями данных конференций в базе Indico.
+
+Источник изменений - уведомления PostgreSQL (LISTEN/NOTIFY) от триггеров,
+которые ставит main.py --install-triggers. Без триггеров используется опрос
+отпечатков мероприятий (database.FINGERPRINTS_QUERY): в таблицах Indico,
+которые читает database, нет отметок времени изменения.
+
+Изменения собираются в пачки с подавлением дребезга: пачка отдается, когда
+новых изменений не было debounce секунд (но не позже max_delay секунд после
+первого изменения пачки). Пачка - словарь {event_id: множество документов
+из doc_generator.DOCUMENT_KINDS, которые нужно пересоздать}.
+"""
+import json
+import select
+import time
+
+import database
+import doc_generator
+
+ALL_DOCUMENTS = frozenset(doc_generator.DOCUMENT_KINDS)
+
+# Документы, которые зависят от таблицы. Почта руководителей есть только в
+# списке к публикации, состояние рецензирования - в программе (разделение
+# докладов) и в списке к публикации (принятые доклады); остальные таблицы
+# влияют на все документы.
+TABLE_DOCUMENTS = {
+    "users.emails": frozenset({"publications"}),
+    "event_paper_reviewing.revisions": frozenset({"program", "publications"}),
+}
+
+def affected_documents(table):
+    """Документы, которые нужно пересоздать при изменении таблицы table
+    (None - таблица неизвестна, пересоздаются все)."""
+    return TABLE_DOCUMENTS.get(table, ALL_DOCUMENTS)
+
+def notification_source(conn):
+    """Источник изменений по уведомлениям канала database.NOTIFY_CHANNEL.
+
+    Возвращает функцию poll(timeout): ждет уведомления не дольше timeout
+    секунд (None - без ограничения) и возвращает список пар
+    (event_id, таблица).
+    """
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {database.NOTIFY_CHANNEL}")
+
+    def poll(timeout):
+        if not conn.notifies and select.select([conn], [], [], timeout) == ([], [], []):
+            return []
+        conn.poll()
+        changes = []
+        while conn.notifies:
+            payload = json.loads(conn.notifies.pop(0).payload)
+            changes.append((payload["event_id"], payload["table"]))
+        return changes
+
+    return poll
+
+def fingerprint_source(conn, interval):
+    """Источник изменений опросом отпечатков мероприятий раз в interval секунд.
+
+    Таблица изменения неизвестна, поэтому для измененного мероприятия
+    пересоздаются все документы (неизменившиеся пропускает кэш документов).
+    """
+    def fetch():
+        with conn.cursor() as cur:
+            fingerprints = database.fetch_fingerprints(cur)
+        conn.rollback()
+        return fingerprints
+
+    known = fetch()
+    next_check = time.monotonic() + interval
+
+    def poll(timeout):
+        nonlocal known, next_check
+        delay = next_check - time.monotonic()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(delay, 0))
+        next_check = time.monotonic() + interval
+        previous, known = known, fetch()
+        return [(int(event_id), None) for event_id, fingerprint in known.items()
+                if previous.get(event_id) != fingerprint]
+
+    return poll
+
+def iter_change_batches(poll, debounce, max_delay):
+    """Генератор пачек изменений {event_id: set(документов)} с подавлением дребезга."""
+    pending = {}
+    first = last = None
+    while True:
+        timeout = None
+        if pending:
+            timeout = max(0, min(last + debounce, first + max_delay) - time.monotonic())
+        changes = poll(timeout)
+        now = time.monotonic()
+        for event_id, table in changes:
+            pending.setdefault(event_id, set()).update(affected_documents(table))
+            if first is None:
+                first = now
+            last = now
+        if pending and now >= min(last + debounce, first + max_delay):
+            yield pending
+            pending = {}
+            first = last = None